@@ -6,16 +6,25 @@ from werkzeug.exceptions import HTTPException
 
 from config import Config
 from services.yolo_service import YoloService
-from ressources.health import HealthResource
+from services.yolo_batcher import YoloBatcher
+from ressources.health import HealthResource, ReadinessResource
 from ressources.detect import DetectResource
 from utils.responses import err
 
-from ressources.descriptors import DescribeResource
+from ressources.descriptors import DescribeResource, DescribeBatchResource
+from ressources.pipeline import DetectDescribeResource
 # from ressources.search import IndexAddResource, SearchSimilarResource
 from services.index_service import FaissIndexService
+from services.shape3d_index_service import Shape3DIndexService, shape3d_params, engine_index_dir
+from services.shape3d_query_cache import QueryDescriptorCache
+from services.job_queue import JobQueue
+from services.describe_executor import DescribeExecutor
+from services.warmup import Warmup, warm_yolo, warm_faiss, warm_features
+from ressources.jobs import JobStatusResource
 
 from ressources.search import (
         Index3DResource,
+        Index3DBulkResource,
         Search3DResource,
         Stats3DResource
     )
@@ -25,7 +34,8 @@ def create_app():
     app.config.from_object(Config)
 
     # Ensure dirs exist
-    os.makedirs(app.config["UPLOAD_DIR"], exist_ok=True)
+    if app.config["PERSIST_UPLOADS"]:
+        os.makedirs(app.config["UPLOAD_DIR"], exist_ok=True)
     os.makedirs(app.config["TMP_DIR"], exist_ok=True)
 
     # Upload limit
@@ -37,19 +47,91 @@ def create_app():
     api = Api(app)
 
     # Services
-    yolo_service = YoloService(app.config["WEIGHTS_PATH"])
+    yolo_service = YoloService(
+        app.config["WEIGHTS_PATH"],
+        backend=Config.YOLO_BACKEND,
+        artifact_path=Config.YOLO_MODEL_PATH
+    )
+    yolo_batcher = None
+    if Config.YOLO_BATCH_MAX > 1:
+        yolo_batcher = YoloBatcher(
+            yolo_service,
+            max_batch=Config.YOLO_BATCH_MAX,
+            max_wait_ms=Config.YOLO_BATCH_WAIT_MS,
+            max_queue=Config.YOLO_BATCH_QUEUE,
+            timeout=Config.YOLO_BATCH_TIMEOUT_S
+        )
     index_service = FaissIndexService(base_dir=os.path.join(os.path.dirname(__file__), "data", "faiss"))
+    # un index 3D par moteur de descripteurs (data/faiss/shape3d/<engine>)
+    shape3d_root = os.path.join(os.path.dirname(__file__), "data", "faiss", "shape3d")
+    shape3d_services = {
+        engine: Shape3DIndexService(
+            index_dir=engine_index_dir(shape3d_root, engine),
+            preload=True,
+            params={**shape3d_params(Config), "engine": engine},
+            local_dtype=Config.SHAPE3D_LOCAL_DTYPE
+        )
+        for engine in Config.SHAPE3D_ENGINES
+    }
+    query_cache = QueryDescriptorCache(
+        capacity=Config.SHAPE3D_QUERY_CACHE_SIZE,
+        persist_dir=Config.SHAPE3D_QUERY_CACHE_DIR
+    )
+    describe_executor = DescribeExecutor(
+        mode=Config.DESCRIBE_EXECUTOR,
+        workers=Config.DESCRIBE_WORKERS,
+        threads=Config.DESCRIBE_WORKER_THREADS,
+        start_method=Config.DESCRIBE_START_METHOD
+    )
+    job_queue = JobQueue(
+        workers=Config.JOB_WORKERS,
+        max_depth=Config.JOB_QUEUE_DEPTH,
+        processes=Config.JOB_PROCESSES
+    )
+
 
+    # Préchauffage optionnel : le premier /detect ne paie plus le
+    # chargement des poids ni la mise en place du graphe
+    warmup = None
+    if Config.WARMUP:
+        warmup = Warmup()
+        warmup.add("yolo", lambda: warm_yolo(
+            yolo_service, Config.YOLO_IMG_SIZE, Config.YOLO_CONF, Config.YOLO_IOU,
+            runs=Config.WARMUP_RUNS, batcher=yolo_batcher
+        ))
+        warmup.add("faiss", lambda: warm_faiss(index_service, shape3d_services))
+        warmup.add("features", lambda: warm_features(describe_executor))
+        warmup.start(background=not Config.WARMUP_BLOCKING)
 
     # Routes
-    api.add_resource(HealthResource, "/health")
+    api.add_resource(HealthResource, "/health", "/health/live")
+    api.add_resource(
+        ReadinessResource, "/health/ready",
+        resource_class_kwargs={"warmup": warmup}
+    )
     api.add_resource(
         DetectResource,
         "/detect",
-        resource_class_kwargs={"yolo_service": yolo_service}
+        resource_class_kwargs={"yolo_service": yolo_service, "batcher": yolo_batcher}
     )
     
-    api.add_resource(DescribeResource, "/describe")
+    api.add_resource(
+        DescribeResource, "/describe",
+        resource_class_kwargs={"describe_executor": describe_executor}
+    )
+    api.add_resource(
+        DescribeBatchResource, "/describe/batch",
+        resource_class_kwargs={"describe_executor": describe_executor}
+    )
+    api.add_resource(
+        DetectDescribeResource, "/detect-describe",
+        resource_class_kwargs={
+            "yolo_service": yolo_service,
+            "batcher": yolo_batcher,
+            "describe_executor": describe_executor,
+            "index_service": index_service
+        }
+    )
 
     # api.add_resource(
     #     IndexAddResource, "/index/add",
@@ -67,8 +149,26 @@ def create_app():
     # preload=True
     # )
     
-    api.add_resource(Index3DResource, "/index-3d")
-    api.add_resource(Search3DResource, "/search-3d")
+    api.add_resource(
+        Index3DResource, "/index-3d",
+        resource_class_kwargs={"shape3d_services": shape3d_services, "job_queue": job_queue}
+    )
+    api.add_resource(
+        Index3DBulkResource, "/index-3d/bulk",
+        resource_class_kwargs={"shape3d_services": shape3d_services, "job_queue": job_queue}
+    )
+    api.add_resource(
+        JobStatusResource, "/jobs/<string:job_id>",
+        resource_class_kwargs={"job_queue": job_queue}
+    )
+    api.add_resource(
+        Search3DResource, "/search-3d",
+        resource_class_kwargs={
+            "shape3d_services": shape3d_services,
+            "query_cache": query_cache,
+            "default_engine": Config.SHAPE3D_DEFAULT_ENGINE
+        }
+    )
     api.add_resource(Stats3DResource, "/stats-3d")
 
     
@@ -0,0 +1,232 @@
+# benchmark_3d.py
+# Benchmark hors ligne de la recherche 3D (leave-one-out sur l'index construit)
+#
+#   python benchmark_3d.py --engine d2 --out runs/d2.json
+#   python benchmark_3d.py --engine shape_context --n-keypoints 20 --build \
+#       --index-dir data/bench/sc20 --out runs/sc20.json
+
+import os
+import json
+import time
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from config import Config
+from services.shape3d_loader import Shape3DLoader
+from services.shape3d_normalizer import Shape3DNormalizer
+from services.shape3d_descriptors import ENGINES
+from services.shape3d_descriptor_cache import file_sha1, content_seed
+from services.shape3d_index_service import (
+    Shape3DIndexService,
+    shape3d_params,
+    engine_index_dir,
+    describe_points,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODELS_DIR = os.path.join(BASE_DIR, "..", "3dDataset", "All Models")
+LABELS_CSV = os.path.join(BASE_DIR, "labels.csv")
+INDEX_ROOT = os.path.join(BASE_DIR, "data", "faiss", "shape3d")
+# --build sans --index-dir : jamais l'index du serveur (ses paramètres
+# écrits dans le sidecar le rendraient inutilisable pour /search-3d)
+BENCH_ROOT = os.path.join(BASE_DIR, "data", "bench")
+
+STAGES = ("load", "normalize", "descriptor", "search")
+
+
+def average_precision(hits, n_relevant):
+    """
+    hits: booléens (résultat pertinent ?) dans l'ordre du classement
+    """
+    if n_relevant == 0:
+        return None
+    hits = np.asarray(hits, dtype=bool)
+    ranks = np.flatnonzero(hits) + 1
+    return float(np.sum(np.arange(1, len(ranks) + 1) / ranks) / n_relevant)
+
+
+def percentiles_ms(values):
+    v = np.asarray(values) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(v, 50)), 3),
+        "p95_ms": round(float(np.percentile(v, 95)), 3),
+        "mean_ms": round(float(v.mean()), 3),
+    }
+
+
+def run_query(svc, path, filename, rerank):
+    """
+    Une requête leave-one-out : pipeline complet chronométré par étape,
+    classement de tout l'index sans le modèle requête.
+    """
+    t = {}
+    t0 = time.perf_counter()
+    # même graine que l'indexation (hash du contenu)
+    seed = content_seed(file_sha1(path))
+    pts = Shape3DLoader.load_obj(path, sample_points=svc.params["sample_points"], seed=seed)
+    t1 = time.perf_counter()
+    pts = Shape3DNormalizer.normalize(pts)
+    t2 = time.perf_counter()
+    local_desc, global_desc = describe_points(pts, svc.params, seed)
+    t3 = time.perf_counter()
+    results = svc.search(global_desc, top_k=svc.size(), query_local=local_desc, rerank_k=rerank)
+    t4 = time.perf_counter()
+
+    t["load"], t["normalize"], t["descriptor"], t["search"] = t1 - t0, t2 - t1, t3 - t2, t4 - t3
+    ranked = [r for r in results if r["filename"] != filename]
+    return ranked, t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark leave-one-out de la recherche 3D")
+    parser.add_argument("--engine", default=Config.SHAPE3D_DEFAULT_ENGINE, choices=ENGINES)
+    parser.add_argument("--index-dir", default=None,
+                        help="index à évaluer (défaut: data/faiss/shape3d[/<engine>], "
+                             "data/bench/<engine> avec --build)")
+    parser.add_argument("--build", action="store_true",
+                        help="(re)construit l'index avec les paramètres ci-dessous avant le benchmark")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sample-points", type=int, default=None)
+    parser.add_argument("--n-keypoints", type=int, default=None)
+    parser.add_argument("--keypoints", choices=("random", "fps"), default=None)
+    parser.add_argument("--radius", type=float, default=None)
+    parser.add_argument("--rerank", type=int, default=0,
+                        help="re-classement local des N premiers candidats (shape_context)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--limit", type=int, default=0, help="nb max de requêtes (0 = toutes)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+
+    params = {**shape3d_params(Config), "engine": args.engine}
+    for key in ("sample_points", "n_keypoints", "keypoints", "radius"):
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+
+    if args.index_dir:
+        index_dir = args.index_dir
+    elif args.build:
+        index_dir = os.path.join(BENCH_ROOT, args.engine)
+    else:
+        index_dir = engine_index_dir(INDEX_ROOT, args.engine)
+    svc = Shape3DIndexService(
+        index_dir=index_dir,
+        params=params,
+        local_dtype=Config.SHAPE3D_LOCAL_DTYPE
+    )
+    if args.build:
+        svc.build_index(MODELS_DIR, LABELS_CSV, workers=args.workers)
+    else:
+        svc.refresh()
+
+    if svc.size() == 0:
+        raise SystemExit(f"[ERREUR] Index vide : {index_dir} (utiliser --build)")
+
+    # requêtes : modèles présents dans l'index ET sur disque
+    indexed = list(zip(svc.store.filenames, svc.store.labels))
+    class_sizes = defaultdict(int)
+    for _, label in indexed:
+        class_sizes[label] += 1
+
+    queries = [
+        (fname, label) for fname, label in indexed
+        if os.path.exists(os.path.join(MODELS_DIR, fname))
+    ]
+    if args.limit:
+        queries = queries[:args.limit]
+
+    print(f"[INFO] {len(queries)} requêtes, index {svc.size()} modèles ({args.engine})")
+
+    ks = sorted(set(args.k))
+    timings = {stage: [] for stage in STAGES}
+    per_query = []
+    failed = []
+    t_start = time.perf_counter()
+
+    for i, (fname, label) in enumerate(queries, 1):
+        path = os.path.join(MODELS_DIR, fname)
+        try:
+            ranked, t = run_query(svc, path, fname, args.rerank)
+        except Exception as e:
+            failed.append({"filename": fname, "error": str(e)})
+            continue
+
+        for stage in STAGES:
+            timings[stage].append(t[stage])
+
+        hits = [r["label"] == label for r in ranked]
+        per_query.append({
+            "filename": fname,
+            "label": label,
+            "ap": average_precision(hits, class_sizes[label] - 1),
+            **{f"p@{k}": float(np.mean(hits[:k])) if hits[:k] else 0.0 for k in ks},
+            "timings_ms": {s: round(t[s] * 1000.0, 3) for s in STAGES},
+        })
+
+        if i % 50 == 0 or i == len(queries):
+            print(f"[INFO] {i}/{len(queries)} requêtes")
+
+    def summarize(rows):
+        aps = [r["ap"] for r in rows if r["ap"] is not None]
+        return {
+            "queries": len(rows),
+            **{f"p@{k}": round(float(np.mean([r[f"p@{k}"] for r in rows])), 4) for k in ks},
+            "mAP": round(float(np.mean(aps)), 4) if aps else None,
+        }
+
+    by_class = defaultdict(list)
+    for r in per_query:
+        by_class[r["label"]].append(r)
+
+    report = {
+        "config": {
+            **params,
+            "index_dir": index_dir,
+            "index_type": type(svc.index).__name__,
+            "index_size": svc.size(),
+            "rerank": args.rerank,
+            "k": ks,
+            "seed": args.seed,
+        },
+        "summary": summarize(per_query) if per_query else {},
+        "per_class": {
+            label: summarize(rows)
+            for label, rows in sorted(by_class.items())
+        },
+        "timings": {
+            stage: percentiles_ms(v) for stage, v in timings.items() if v
+        },
+        "wall_s": round(time.perf_counter() - t_start, 3),
+        "failed": failed,
+        "queries": per_query,
+    }
+
+    # --------------------------------------------------
+    s = report["summary"]
+    print("\n=== Résultats ===")
+    print("  " + "  ".join(f"P@{k}={s.get(f'p@{k}', 0):.3f}" for k in ks)
+          + f"  mAP={s.get('mAP') or 0:.3f}")
+    for stage, v in report["timings"].items():
+        print(f"  {stage:<10} p50={v['p50_ms']:.2f} ms  p95={v['p95_ms']:.2f} ms")
+    print("\n  Par classe :")
+    for label, c in report["per_class"].items():
+        print(f"  {label:<28} n={c['queries']:<4} P@{ks[0]}={c[f'p@{ks[0]}']:.3f}"
+              f"  mAP={c['mAP'] or 0:.3f}")
+    if failed:
+        print(f"\n[WARN] {len(failed)} requêtes échouées")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n[OK] Résultats écrits dans {args.out}")
+
+
+if __name__ == "__main__":
+    main()
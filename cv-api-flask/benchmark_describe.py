@@ -0,0 +1,163 @@
+# benchmark_describe.py
+# Compare l'extraction crop par crop (describe_object) et le mode
+# multi-crop (describe_objects) : temps et écart des descripteurs.
+#
+#   python benchmark_describe.py --grid 4 --mosaics 10
+#   python benchmark_describe.py --grid 4 --overlap 3      # boîtes qui se chevauchent
+#   python benchmark_describe.py --image photo.jpg --boxes boxes.json
+#   python benchmark_describe.py --max-side 640,320       # image réduite
+#
+# Code de sortie 1 si un bloc passe sous sa similarité minimale (LIMITS).
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+from services.feature_service import FeatureService
+from utils.cv_ops import crop_xyxy
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+THUMBNAILS = os.path.join(BASE_DIR, "..", "3dDataset", "Thumbnails", "*", "*.jpg")
+
+BLOCKS = ("color_hist_hsv", "dominant_colors_lab", "gabor", "tamura",
+          "hu_moments", "orientation_hist", "lbp_hist")
+
+# cosinus min multi-crop vs crop par crop, par bloc (grilles 4x4, avec
+# et sans chevauchement, max_side 640 et 320). L'histogramme
+# d'orientations est le plus sensible au changement d'échelle.
+LIMITS = {
+    "color_hist_hsv": 0.99,
+    "dominant_colors_lab": 0.97,
+    "gabor": 0.98,
+    "tamura": 0.95,
+    "hu_moments": 0.99,
+    "orientation_hist": 0.88,
+    "lbp_hist": 0.97,
+    "feature_vector": 0.97,
+}
+
+
+def mosaics(grid, count, tile=160, overlap=0, seed=0):
+    """
+    Images synthétiques : grille grid x grid de vignettes du dataset,
+    une boîte par vignette (cas "une image, beaucoup de détections"),
+    plus `overlap` boîtes décalées par vignette (détections qui se
+    chevauchent, le cas fréquent en sortie de YOLO)
+    """
+    rng = np.random.default_rng(seed)
+    files = sorted(glob.glob(THUMBNAILS))
+    for _ in range(count):
+        picks = rng.choice(len(files), grid * grid, replace=False)
+        img = np.full((grid * tile, grid * tile, 3), 255, dtype=np.uint8)
+        boxes = []
+        for k, i in enumerate(picks):
+            th = cv2.imread(files[i])
+            if th is None:
+                continue
+            th = cv2.resize(th, (tile - 8, tile - 8), interpolation=cv2.INTER_AREA)
+            y, x = (k // grid) * tile + 4, (k % grid) * tile + 4
+            img[y:y + tile - 8, x:x + tile - 8] = th
+            boxes.append([x, y, x + tile - 8, y + tile - 8])
+            for _ in range(overlap):
+                dx, dy = (int(v) for v in rng.integers(-tile // 4, tile // 4 + 1, size=2))
+                boxes.append([max(0, x + dx), max(0, y + dy),
+                              min(img.shape[1], x + dx + tile - 8),
+                              min(img.shape[0], y + dy + tile - 8)])
+        yield img, boxes
+
+
+def cosine(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    na, nb = np.linalg.norm(a), np.linalg.norm(b)
+    if na == 0 or nb == 0:
+        return 1.0 if na == nb else 0.0
+    return float(a @ b / (na * nb))
+
+
+def run(fs, cases, max_side):
+    """
+    Returns:
+        (rapport, {bloc: cosinus min})
+    """
+    t_crop, t_multi, n_boxes = 0.0, 0.0, 0
+    sims = {b: [] for b in BLOCKS + ("feature_vector",)}
+
+    for img, boxes in cases:
+        t = time.perf_counter()
+        per_crop = []
+        for bbox in boxes:
+            crop, _ = crop_xyxy(img, bbox)
+            per_crop.append(fs.describe_object(crop))
+        t_crop += time.perf_counter() - t
+
+        t = time.perf_counter()
+        multi = fs.describe_objects(img, boxes, max_side=max_side)
+        t_multi += time.perf_counter() - t
+        n_boxes += len(boxes)
+
+        for a, (_, b) in zip(per_crop, multi):
+            if isinstance(b, Exception):
+                continue
+            for key in sims:
+                sims[key].append(cosine(a[key], b[key]))
+
+    mins = {k: float(np.min(v)) for k, v in sims.items() if v}
+    report = {
+        "boxes": n_boxes,
+        "max_side": max_side,
+        "per_crop_ms_per_box": round(t_crop / max(1, n_boxes) * 1000, 3),
+        "multi_ms_per_box": round(t_multi / max(1, n_boxes) * 1000, 3),
+        "speedup": round(t_crop / max(t_multi, 1e-9), 2),
+        # similarité cosinus multi-crop vs crop par crop, par bloc
+        "cosine": {
+            k: {"mean": round(float(np.mean(v)), 4), "min": round(mins[k], 4),
+                "limit": LIMITS[k], "ok": mins[k] >= LIMITS[k]}
+            for k, v in sims.items() if v
+        },
+    }
+    return report, mins
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-crop vs multi-crop descriptors")
+    parser.add_argument("--image", default=None)
+    parser.add_argument("--boxes", default=None, help="JSON [[x1,y1,x2,y2], ...]")
+    parser.add_argument("--grid", type=int, default=4)
+    parser.add_argument("--mosaics", type=int, default=10)
+    parser.add_argument("--overlap", type=int, default=0)
+    parser.add_argument("--max-side", default=f"{FeatureService.MULTI_MAX_SIDE},320",
+                        help="max_side de describe_objects (liste, un cas par valeur)")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.boxes) as f:
+            cases = [(cv2.imread(args.image), json.load(f))]
+    else:
+        cases = list(mosaics(args.grid, args.mosaics, overlap=args.overlap))
+
+    fs = FeatureService()
+    reports, failed = [], False
+    for max_side in (int(m) for m in args.max_side.split(",")):
+        report, mins = run(fs, cases, max_side)
+        reports.append(report)
+        for key, value in mins.items():
+            if value < LIMITS[key]:
+                failed = True
+                print(f"[FAIL] max_side={max_side} {key}: cosine min {value:.4f} < {LIMITS[key]}")
+
+    print(json.dumps(reports, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# benchmark_yolo.py
+# Backends CPU de YoloService : parité des détections avec PyTorch
+# (best.pt) et débit images/s, sur la machine de build.
+#
+#   python export_yolo.py --backend all
+#   python benchmark_yolo.py --backends pytorch,onnx,openvino --batch 1,8
+#
+# Code de sortie 1 si un backend n'est pas à parité (cf. --min-match),
+# si la référence PyTorch est indisponible ou si aucun backend n'a été
+# comparé (pas de succès par défaut).
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+from config import Config
+from services.yolo_service import YoloService, BACKENDS, backend_artifact
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGES = os.path.join(BASE_DIR, "..", "3dDataset", "Thumbnails", "*", "*.jpg")
+
+
+def detections(result):
+    """
+    Results ultralytics -> (boîtes (n, 4) xyxy, conf (n,), classes (n,))
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)
+    return (boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy().astype(int))
+
+
+def iou_matrix(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match(ref, other, min_iou):
+    """
+    Appariement glouton (même classe, IoU >= min_iou) des détections
+    d'un backend avec celles de référence
+
+    Returns:
+        (nb appariées, IoU des paires, |Δconf| des paires)
+    """
+    (rb, rc, rk), (ob, oc, ok) = ref, other
+    if len(rb) == 0 or len(ob) == 0:
+        return 0, [], []
+    iou = iou_matrix(rb, ob)
+    iou[rk[:, None] != ok[None, :]] = 0.0
+    used, ious, dconf = [], [], []
+    for i in np.argsort(-rc):
+        row = iou[i].copy()
+        row[used] = -1.0
+        j = int(np.argmax(row))
+        if row[j] >= min_iou:
+            used.append(j)
+            ious.append(float(row[j]))
+            dconf.append(float(abs(rc[i] - oc[j])))
+    return len(used), ious, dconf
+
+
+def throughput(svc, images, batch, args, repeat):
+    # chauffe (graphe, allocations, caches du runtime)
+    svc.predict_batch(images[:batch], args.conf, args.iou, args.imgsz)
+    t = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, len(images), batch):
+            svc.predict_batch(images[i:i + batch], args.conf, args.iou, args.imgsz)
+    return repeat * len(images) / (time.perf_counter() - t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO CPU backends: parity + images/sec")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--weights", default=Config.WEIGHTS_PATH)
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="glob d'images")
+    parser.add_argument("--limit", type=int, default=64)
+    parser.add_argument("--batch", default="1,8", help="tailles de batch du débit")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--conf", type=float, default=Config.YOLO_CONF)
+    parser.add_argument("--iou", type=float, default=Config.YOLO_IOU)
+    parser.add_argument("--imgsz", type=int, default=Config.YOLO_IMG_SIZE)
+    parser.add_argument("--match-iou", type=float, default=0.9,
+                        help="IoU min pour apparier deux détections")
+    parser.add_argument("--min-match", type=float, default=0.98,
+                        help="part min des détections PyTorch retrouvées (parité)")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.images))[:args.limit]
+    images = [img for img in (cv2.imread(f) for f in files) if img is not None]
+    if not images:
+        sys.exit(f"[ERROR] Aucune image : {args.images}")
+    batches = [int(b) for b in args.batch.split(",")]
+
+    # PyTorch d'abord : c'est la référence de parité
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    backends = ["pytorch"] + [b for b in backends if b != "pytorch"]
+
+    report = {"images": len(images), "imgsz": args.imgsz, "backends": {}}
+    reference = None
+    compared = 0
+    failed = False
+
+    for backend in backends:
+        path = backend_artifact(args.weights, backend)
+        if not os.path.exists(path):
+            if backend == "pytorch":
+                sys.exit(f"[ERROR] Référence PyTorch absente : {path}")
+            print(f"[SKIP] {backend}: {path} absent (python export_yolo.py --backend {backend})")
+            continue
+        svc = YoloService(args.weights, backend=backend)
+        svc.load()
+
+        dets = [detections(svc.predict(img, args.conf, args.iou, args.imgsz)[0]) for img in images]
+        entry = {"model": svc.model_name}
+
+        if reference is None:
+            reference = dets
+        else:
+            n_ref = sum(len(d[0]) for d in reference)
+            n_other = sum(len(d[0]) for d in dets)
+            matched, ious, dconf = 0, [], []
+            for ref, other in zip(reference, dets):
+                m, i, c = match(ref, other, args.match_iou)
+                matched += m
+                ious += i
+                dconf += c
+            recall = matched / n_ref if n_ref else 1.0
+            precision = matched / n_other if n_other else 1.0
+            entry["parity"] = {
+                "reference_detections": n_ref,
+                "detections": n_other,
+                "matched_recall": round(recall, 4),
+                "matched_precision": round(precision, 4),
+                "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+                "max_conf_diff": round(float(np.max(dconf)), 4) if dconf else None,
+                "ok": recall >= args.min_match and precision >= args.min_match,
+            }
+            failed |= not entry["parity"]["ok"]
+            compared += 1
+
+        entry["images_per_sec"] = {}
+        for b in batches:
+            try:
+                entry["images_per_sec"][str(b)] = round(throughput(svc, images, b, args, args.repeat), 2)
+            except Exception as e:
+                # export à forme fixe : batch > 1 non supporté
+                entry["images_per_sec"][str(b)] = None
+                print(f"[WARN] {backend} batch={b}: {e}")
+
+        report["backends"][backend] = entry
+        print(f"[INFO] {backend}: {json.dumps(entry)}")
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if compared == 0:
+        print("[ERROR] Aucun backend comparé à la référence PyTorch")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
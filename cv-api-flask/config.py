@@ -14,7 +14,18 @@ class Config:
     # Paths
     WEIGHTS_PATH = os.getenv("WEIGHTS_PATH", os.path.join(BASE_DIR, "weights", "best.pt"))
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(BASE_DIR, "data", "uploads"))
+    # /detect, /describe : images décodées en mémoire ; copie des uploads
+    # dans UPLOAD_DIR seulement si PERSIST_UPLOADS=1
+    PERSIST_UPLOADS = os.getenv("PERSIST_UPLOADS", "0") == "1"
     TMP_DIR = os.getenv("TMP_DIR", os.path.join(BASE_DIR, "data", "tmp"))
+    # Cache .npz des points 3D échantillonnés (vide = désactivé)
+    SHAPE3D_POINTS_CACHE_DIR = os.getenv("SHAPE3D_POINTS_CACHE_DIR", "")
+
+    # Préchauffage au démarrage (YOLO, index FAISS, FeatureService) ;
+    # /health/ready répond 503 tant qu'il n'est pas terminé
+    WARMUP = os.getenv("WARMUP", "0") == "1"
+    WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "0") == "1"   # create_app attend la fin
+    WARMUP_RUNS = int(os.getenv("WARMUP_RUNS", "3"))             # inférences YOLO factices
 
     # Server
     HOST = os.getenv("FLASK_HOST", "127.0.0.1")
@@ -26,9 +37,57 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(50 * 1024 * 1024)))
 
     # YOLO settings
+    # Backend d'inférence CPU : pytorch | torchscript | onnx | openvino
+    # (artefact produit hors ligne par export_yolo.py à côté de WEIGHTS_PATH)
+    YOLO_BACKEND = os.getenv("YOLO_BACKEND", "pytorch")
+    YOLO_MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "") or None   # vide = chemin par convention
     YOLO_CONF = float(os.getenv("YOLO_CONF", "0.25"))
     YOLO_IOU = float(os.getenv("YOLO_IOU", "0.45"))
     YOLO_IMG_SIZE = int(os.getenv("YOLO_IMG_SIZE", "640"))
+    # Micro-batching /detect : batch max, attente max après la 1re image,
+    # profondeur de file (pleine -> 503). YOLO_BATCH_MAX=1 désactive.
+    # YOLO_BATCH_TIMEOUT_S : attente max d'une requête (dépassée -> 504, 0 = sans limite)
+    YOLO_BATCH_MAX = int(os.getenv("YOLO_BATCH_MAX", "8"))
+    YOLO_BATCH_WAIT_MS = float(os.getenv("YOLO_BATCH_WAIT_MS", "10"))
+    YOLO_BATCH_QUEUE = int(os.getenv("YOLO_BATCH_QUEUE", "64"))
+    YOLO_BATCH_TIMEOUT_S = float(os.getenv("YOLO_BATCH_TIMEOUT_S", "30")) or None
+
+    # /describe : exécution de l'extraction (inline | thread | process)
+    DESCRIBE_EXECUTOR = os.getenv("DESCRIBE_EXECUTOR", "inline")
+    DESCRIBE_WORKERS = int(os.getenv("DESCRIBE_WORKERS", "0")) or None   # 0 = nb CPU
+    # threads BLAS / OpenMP / OpenCV par worker processus (évite la sursouscription)
+    DESCRIBE_WORKER_THREADS = int(os.getenv("DESCRIBE_WORKER_THREADS", "1"))
+    DESCRIBE_START_METHOD = os.getenv("DESCRIBE_START_METHOD", "spawn")   # spawn | forkserver | fork
+
+    # /detect-describe : confiance min des détections décrites (défaut = YOLO_CONF)
+    PIPELINE_MIN_CONF = float(os.getenv("PIPELINE_MIN_CONF", os.getenv("YOLO_CONF", "0.25")))
+
+    # /describe/batch : nb max de boîtes par image (extraction : DESCRIBE_EXECUTOR)
+    DESCRIBE_MAX_BOXES = int(os.getenv("DESCRIBE_MAX_BOXES", "100"))
+
+    # Descripteurs 3D (doivent être identiques entre indexation et recherche)
+    SHAPE3D_SAMPLE_POINTS = int(os.getenv("SHAPE3D_SAMPLE_POINTS", "2048"))
+    SHAPE3D_KEYPOINTS = os.getenv("SHAPE3D_KEYPOINTS", "random")   # random | fps
+    SHAPE3D_RADIUS = float(os.getenv("SHAPE3D_RADIUS", "0")) or None  # 0 = nuage entier
+    # Moteurs de descripteurs 3D indexés (un index FAISS chacun) :
+    # shape_context (local + rerank) | d2 | a3 | voxel (globaux, rapides)
+    SHAPE3D_ENGINES = [
+        e.strip() for e in os.getenv("SHAPE3D_ENGINES", "shape_context,d2,a3,voxel").split(",")
+        if e.strip()
+    ]
+    SHAPE3D_DEFAULT_ENGINE = os.getenv("SHAPE3D_DEFAULT_ENGINE", "shape_context")
+    # Cache des descripteurs de requête /search-3d (LRU mémoire, disque optionnel)
+    SHAPE3D_QUERY_CACHE_SIZE = int(os.getenv("SHAPE3D_QUERY_CACHE_SIZE", "256"))
+    SHAPE3D_QUERY_CACHE_DIR = os.getenv("SHAPE3D_QUERY_CACHE_DIR", "")   # vide = mémoire seule
+    # Stockage des descripteurs locaux (float16 : moitié de la taille disque / RAM)
+    SHAPE3D_LOCAL_DTYPE = os.getenv("SHAPE3D_LOCAL_DTYPE", "float32")
+    # Processus d'extraction pour /index-3d/bulk (0 = nb CPU)
+    SHAPE3D_BULK_WORKERS = int(os.getenv("SHAPE3D_BULK_WORKERS", "0")) or None
+
+    # Jobs de fond (indexation 3D) : file locale, sans broker
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_PROCESSES = int(os.getenv("JOB_PROCESSES", "2"))
+    JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "32"))
 
     # Allowed extensions
     ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "webp"}
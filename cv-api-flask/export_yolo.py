@@ -0,0 +1,60 @@
+# export_yolo.py
+# Export hors ligne de WEIGHTS_PATH (best.pt) vers les backends CPU de
+# YoloService ; l'artefact est écrit à côté des poids, là où
+# YoloService le cherche (cf. backend_artifact).
+#
+#   python export_yolo.py --backend onnx
+#   python export_yolo.py --backend all
+#   YOLO_BACKEND=onnx python app.py
+
+import os
+import argparse
+
+from ultralytics import YOLO
+
+from config import Config
+from services.yolo_service import BACKENDS, backend_artifact
+
+# backend YoloService -> format d'export ultralytics
+FORMATS = {"torchscript": "torchscript", "onnx": "onnx", "openvino": "openvino"}
+
+
+def export(weights, backend, imgsz, dynamic):
+    model = YOLO(weights)
+    kwargs = {"format": FORMATS[backend], "imgsz": imgsz, "device": "cpu"}
+    if backend in ("onnx", "openvino"):
+        # batch / taille dynamiques : nécessaire au micro-batching de /detect
+        kwargs["dynamic"] = dynamic
+    if backend == "onnx":
+        kwargs["simplify"] = True
+    return model.export(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLO weights for CPU backends")
+    parser.add_argument("--backend", default="all", choices=("all",) + tuple(FORMATS))
+    parser.add_argument("--weights", default=Config.WEIGHTS_PATH)
+    parser.add_argument("--imgsz", type=int, default=Config.YOLO_IMG_SIZE)
+    parser.add_argument("--static", action="store_true",
+                        help="forme fixe (batch 1) au lieu de dynamique (onnx / openvino)")
+    args = parser.parse_args()
+
+    backends = list(FORMATS) if args.backend == "all" else [args.backend]
+    for backend in backends:
+        module = BACKENDS[backend]
+        print(f"[INFO] Export {backend} (imgsz={args.imgsz}) ...")
+        try:
+            path = export(args.weights, backend, args.imgsz, dynamic=not args.static)
+        except Exception as e:
+            hint = f" (pip install {module})" if module else ""
+            print(f"[ERROR] {backend}: {e}{hint}")
+            continue
+
+        expected = backend_artifact(args.weights, backend)
+        if os.path.normpath(str(path)) != os.path.normpath(expected):
+            print(f"[WARN] {path} != {expected} : définir YOLO_MODEL_PATH={path}")
+        print(f"[OK] {backend} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,20 @@
-import cv2
+import json
+import math
 from flask_restful import Resource
 from flask import request, current_app
 
 from utils.responses import ok, err
-from utils.image_io import allowed_file, save_upload
+from utils.image_io import allowed_file, ingest_upload
 from utils.cv_ops import crop_xyxy
 from services.feature_service import FeatureService
+from services.describe_executor import DescribeExecutor
 
 
 
 class DescribeResource(Resource):
-    def __init__(self):
-        self.feat = FeatureService()
+    def __init__(self, describe_executor=None):
+        # sans executor : extraction inline dans le thread de la requête
+        self.executor = describe_executor or DescribeExecutor("inline")
 
     def post(self):
         """
@@ -51,9 +54,8 @@ class DescribeResource(Resource):
             except Exception:
                 return err("Missing/invalid bbox fields x1,y1,x2,y2", 400)
 
-        # save image then read with cv2
-        img_path = save_upload(file, cfg["UPLOAD_DIR"])
-        img = cv2.imread(img_path)
+        # décodage en mémoire (copie disque seulement si PERSIST_UPLOADS)
+        img, _ = ingest_upload(file, cfg["UPLOAD_DIR"] if cfg["PERSIST_UPLOADS"] else None)
         if img is None:
             return err("Failed to read image", 400)
 
@@ -66,7 +68,7 @@ class DescribeResource(Resource):
             bbox_fixed = [0.0, 0.0, float(w), float(h)]
 
         try:
-            desc = self.feat.describe_object(crop)
+            desc = self.executor.describe(crop)
         except Exception as e:
             return err("Descriptor extraction failed", 500, {"error": str(e)})
 
@@ -74,3 +76,131 @@ class DescribeResource(Resource):
             "bbox_xyxy": list(map(float, bbox_fixed)),
             "descriptors": desc
         })
+
+
+def parse_boxes(raw):
+    """
+    boxes (JSON) : [[x1,y1,x2,y2], ...] ou détections
+    [{"id": ..., "bbox_xyxy": [x1,y1,x2,y2]}, ...] (format de /detect)
+
+    Returns:
+        liste de (id ou None, [x1,y1,x2,y2])
+    """
+    items = json.loads(raw)
+    if not isinstance(items, list):
+        raise ValueError("boxes must be a JSON list")
+
+    boxes = []
+    for i, item in enumerate(items):
+        box_id = None
+        if isinstance(item, dict):
+            box_id = item.get("id")
+            bbox = item.get("bbox_xyxy")
+            if bbox is None:
+                bbox = [item.get(k) for k in ("x1", "y1", "x2", "y2")]
+        else:
+            bbox = item
+        # liste de 4 nombres finis (pas de chaîne "1234", ni NaN / Infinity)
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+            raise ValueError(f"Invalid bbox at index {i}")
+        try:
+            bbox = [float(v) for v in bbox]
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid bbox at index {i}")
+        if not all(math.isfinite(v) for v in bbox):
+            raise ValueError(f"Invalid bbox at index {i}")
+        boxes.append((box_id, bbox))
+    return boxes
+
+
+class DescribeBatchResource(Resource):
+    def __init__(self, describe_executor=None):
+        # mode crop : même exécuteur que /describe (DESCRIBE_EXECUTOR)
+        self.executor = describe_executor or DescribeExecutor("inline")
+        self.feat = FeatureService()
+
+    def post(self):
+        """
+        POST /describe/batch
+        form-data:
+          - image: File (envoyée et décodée une seule fois)
+          - boxes: JSON [[x1,y1,x2,y2], ...] ou [{"id":..., "bbox_xyxy":[...]}, ...]
+          - mode: "crop" (défaut, identique à /describe) | "multi"
+                  (cartes de texture calculées une fois sur l'image entière,
+                  cf. FeatureService.describe_objects)
+        Réponse : descripteurs dans l'ordre des boîtes
+        """
+        if "image" not in request.files:
+            return err("Missing file field 'image'", 400)
+
+        file = request.files["image"]
+        if file.filename == "":
+            return err("Empty filename", 400)
+
+        cfg = current_app.config
+        if not allowed_file(file.filename, cfg["ALLOWED_EXTENSIONS"]):
+            return err("Unsupported file type", 415, {"allowed": sorted(list(cfg["ALLOWED_EXTENSIONS"]))})
+
+        try:
+            boxes = parse_boxes(request.form.get("boxes", ""))
+        except ValueError as e:
+            return err(f"Missing/invalid field 'boxes': {e}", 400)
+
+        if not boxes:
+            return err("Empty 'boxes' list", 400)
+        if len(boxes) > cfg["DESCRIBE_MAX_BOXES"]:
+            return err("Too many boxes", 400, {"max": cfg["DESCRIBE_MAX_BOXES"]})
+
+        mode = request.form.get("mode", "crop")
+        if mode not in ("crop", "multi"):
+            return err("Invalid 'mode'", 400, {"allowed": ["crop", "multi"]})
+
+        # un seul décodage, en mémoire
+        img, _ = ingest_upload(file, cfg["UPLOAD_DIR"] if cfg["PERSIST_UPLOADS"] else None)
+        if img is None:
+            return err("Failed to read image", 400)
+        h, w = img.shape[:2]
+
+        def describe_crops():
+            items, crops, slots = [], [], []
+            for box_id, bbox in boxes:
+                out = {"id": box_id, "bbox_xyxy": list(map(float, bbox))}
+                try:
+                    crop, bbox_fixed = crop_xyxy(img, bbox)
+                    out["bbox_xyxy"] = list(map(float, bbox_fixed))
+                    crops.append(crop)
+                    slots.append(out)
+                except Exception as e:
+                    out["error"] = str(e)
+                items.append(out)
+
+            # tous les crops soumis ensemble à l'exécuteur (thread / process)
+            for out, desc in zip(slots, self.executor.describe_many(crops)):
+                if isinstance(desc, Exception):
+                    out["error"] = str(desc)
+                else:
+                    out["descriptors"] = desc
+            return items
+
+        def describe_multi():
+            results = self.feat.describe_objects(img, [bbox for _, bbox in boxes])
+            items = []
+            for (box_id, _), (bbox_fixed, desc) in zip(boxes, results):
+                out = {"id": box_id, "bbox_xyxy": list(map(float, bbox_fixed))}
+                if isinstance(desc, Exception):
+                    out["error"] = str(desc)
+                else:
+                    out["descriptors"] = desc
+                items.append(out)
+            return items
+
+        items = describe_multi() if mode == "multi" else describe_crops()
+
+        failed = sum(1 for it in items if "error" in it)
+        return ok({
+            "image": {"width": w, "height": h},
+            "mode": mode,
+            "count": len(items),
+            "failed": failed,
+            "items": items
+        })
@@ -1,11 +1,66 @@
+import queue
+from concurrent.futures import TimeoutError as FutureTimeout
 from flask_restful import Resource
 from flask import request, current_app
 from utils.responses import ok, err
-from utils.image_io import allowed_file, save_upload, get_image_size
+from utils.image_io import allowed_file, ingest_upload
+
+
+def run_detection(yolo, batcher, img, cfg):
+    """
+    Inférence YOLO sur une image décodée (via le micro-batching si actif).
+    Lève queue.Full si la file de détection est pleine,
+    concurrent.futures.TimeoutError si YOLO_BATCH_TIMEOUT_S est dépassé.
+    Returns: Results ultralytics de l'image
+    """
+    if batcher is not None:
+        return batcher.predict(
+            img,
+            conf=cfg["YOLO_CONF"],
+            iou=cfg["YOLO_IOU"],
+            imgsz=cfg["YOLO_IMG_SIZE"]
+        )
+    return yolo.predict(
+        source=img,
+        conf=cfg["YOLO_CONF"],
+        iou=cfg["YOLO_IOU"],
+        imgsz=cfg["YOLO_IMG_SIZE"]
+    )[0]
+
+
+def parse_detections(r0):
+    detections = []
+    names = r0.names  # dict: id -> name
+
+    if r0.boxes is not None and len(r0.boxes) > 0:
+        # xyxy: (N, 4), conf: (N,), cls: (N,)
+        xyxy = r0.boxes.xyxy.cpu().numpy()
+        confs = r0.boxes.conf.cpu().numpy()
+        clss = r0.boxes.cls.cpu().numpy().astype(int)
+
+        for bbox, conf, cls_id in zip(xyxy, confs, clss):
+            x1, y1, x2, y2 = bbox.tolist()
+            detections.append({
+                "class_id": int(cls_id),
+                "class_name": names.get(int(cls_id), str(cls_id)),
+                "confidence": float(conf),
+                "bbox_xyxy": [float(x1), float(y1), float(x2), float(y2)]
+            })
+    return detections
+
 
 class DetectResource(Resource):
-    def __init__(self, yolo_service):
+    def __init__(self, yolo_service, batcher=None):
         self.yolo = yolo_service
+        self.batcher = batcher
+
+    def get(self):
+        """
+        GET /detect : métriques du micro-batching
+        """
+        if self.batcher is None:
+            return ok({"batching": False})
+        return ok({"batching": True, **self.batcher.metrics()})
 
     def post(self):
         if "image" not in request.files:
@@ -19,44 +74,29 @@ class DetectResource(Resource):
         if not allowed_file(file.filename, cfg["ALLOWED_EXTENSIONS"]):
             return err("Unsupported file type", 415, {"allowed": sorted(list(cfg["ALLOWED_EXTENSIONS"]))})
 
-        # Save upload
-        img_path = save_upload(file, cfg["UPLOAD_DIR"])
-        w, h = get_image_size(img_path)
+        # Décodage unique en mémoire (copie disque seulement si PERSIST_UPLOADS)
+        img, _ = ingest_upload(file, cfg["UPLOAD_DIR"] if cfg["PERSIST_UPLOADS"] else None)
+        if img is None:
+            return err("Failed to read image", 400)
+        h, w = img.shape[:2]
 
         # YOLO inference
         try:
-            results = self.yolo.predict(
-                image_path=img_path,
-                conf=cfg["YOLO_CONF"],
-                iou=cfg["YOLO_IOU"],
-                imgsz=cfg["YOLO_IMG_SIZE"]
-            )
+            r0 = run_detection(self.yolo, self.batcher, img, cfg)
+        except queue.Full:
+            return err("Detection queue full, retry later", 503)
+        except FutureTimeout:
+            return err("Detection timed out", 504)
         except Exception as e:
             return err("YOLO inference failed", 500, {"error": str(e)})
 
         # Parse results
-        detections = []
-        r0 = results[0]
-        names = r0.names  # dict: id -> name
-
-        if r0.boxes is not None and len(r0.boxes) > 0:
-            # xyxy: (N, 4), conf: (N,), cls: (N,)
-            xyxy = r0.boxes.xyxy.cpu().numpy()
-            confs = r0.boxes.conf.cpu().numpy()
-            clss = r0.boxes.cls.cpu().numpy().astype(int)
-
-            for bbox, conf, cls_id in zip(xyxy, confs, clss):
-                x1, y1, x2, y2 = bbox.tolist()
-                detections.append({
-                    "class_id": int(cls_id),
-                    "class_name": names.get(int(cls_id), str(cls_id)),
-                    "confidence": float(conf),
-                    "bbox_xyxy": [float(x1), float(y1), float(x2), float(y2)]
-                })
+        detections = parse_detections(r0)
 
         return ok({
             "image": {"width": w, "height": h},
-            "model": "best.pt",
+            "model": self.yolo.model_name,
+            "backend": self.yolo.backend,
             "detections": detections,
             "count": len(detections)
         })
@@ -1,6 +1,28 @@
 from flask_restful import Resource
-from utils.responses import ok
+from utils.responses import ok, err
 
 class HealthResource(Resource):
+    """
+    Liveness : le processus répond (indépendant du préchauffage)
+    """
     def get(self):
         return ok({"status": "ok"})
+
+
+class ReadinessResource(Resource):
+    """
+    Readiness : 200 une fois le préchauffage terminé, 503 avant
+    (ou en cas d'échec) avec l'avancement et les temps par étape.
+    Sans préchauffage (WARMUP=0), toujours prêt (chargement paresseux).
+    """
+    def __init__(self, warmup=None):
+        self.warmup = warmup
+
+    def get(self):
+        if self.warmup is None:
+            return ok({"status": "ready", "eager": False})
+
+        status = {"eager": True, **self.warmup.status()}
+        if not self.warmup.ready:
+            return err("Not ready", 503, status)
+        return ok({"status": "ready", **status})
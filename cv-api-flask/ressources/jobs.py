@@ -0,0 +1,18 @@
+from flask_restful import Resource
+from utils.responses import ok, err
+
+
+class JobStatusResource(Resource):
+    """
+    GET /jobs/<job_id>
+    Statut d'un job de fond : queued / running / done / failed + timings
+    """
+
+    def __init__(self, job_queue):
+        self.jobs = job_queue
+
+    def get(self, job_id):
+        job = self.jobs.status(job_id)
+        if job is None:
+            return err("Job introuvable", 404)
+        return ok({"job": job, "queue_depth": self.jobs.depth()})
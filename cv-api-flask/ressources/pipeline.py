@@ -0,0 +1,211 @@
+import time
+import queue
+from concurrent.futures import TimeoutError as FutureTimeout
+import numpy as np
+from flask_restful import Resource
+from flask import request, current_app
+
+from utils.responses import ok, err
+from utils.image_io import allowed_file, ingest_upload
+from utils.cv_ops import crop_xyxy
+from services.feature_service import FeatureService
+from ressources.detect import run_detection, parse_detections
+
+
+class DetectDescribeResource(Resource):
+    """
+    Détection + descripteurs en un seul aller-retour, sur la même image
+    décodée une fois en mémoire. Les deux étapes ont chacune leur
+    exécuteur (micro-batching YOLO, DescribeExecutor) : sous charge,
+    l'extraction des descripteurs de l'image i se fait pendant que le
+    batcher détecte l'image i+1.
+    """
+
+    def __init__(self, yolo_service, batcher=None, describe_executor=None, index_service=None):
+        self.yolo = yolo_service
+        self.batcher = batcher
+        self.executor = describe_executor
+        self.index = index_service
+        self.feat = FeatureService()
+
+    def post(self):
+        """
+        POST /detect-describe
+        form-data:
+          - image: File
+          - min_conf: float (optionnel, défaut PIPELINE_MIN_CONF) : seules les
+                      détections >= min_conf reçoivent des descripteurs
+          - mode: "crop" (défaut, identique à /describe) | "multi"
+          - index: 1 pour insérer les vecteurs dans l'index FAISS par classe
+          - image_id: optionnel, gardé dans les metadata de l'index
+        """
+        if "image" not in request.files:
+            return err("Missing file field 'image'", 400)
+
+        file = request.files["image"]
+        if file.filename == "":
+            return err("Empty filename", 400)
+
+        cfg = current_app.config
+        if not allowed_file(file.filename, cfg["ALLOWED_EXTENSIONS"]):
+            return err("Unsupported file type", 415, {"allowed": sorted(list(cfg["ALLOWED_EXTENSIONS"]))})
+
+        try:
+            min_conf = float(request.form.get("min_conf", cfg["PIPELINE_MIN_CONF"]))
+        except ValueError:
+            return err("Invalid 'min_conf'", 400)
+
+        mode = request.form.get("mode", "crop")
+        if mode not in ("crop", "multi"):
+            return err("Invalid 'mode'", 400, {"allowed": ["crop", "multi"]})
+
+        do_index = request.form.get("index", "0") == "1"
+        if do_index and self.index is None:
+            return err("Indexing not available", 400)
+        image_id = request.form.get("image_id")
+
+        timings = {}
+        t = time.perf_counter()
+
+        def lap(name):
+            nonlocal t
+            now = time.perf_counter()
+            timings[name] = round((now - t) * 1000.0, 3)
+            t = now
+
+        # 1) décodage unique
+        img, _ = ingest_upload(file, cfg["UPLOAD_DIR"] if cfg["PERSIST_UPLOADS"] else None)
+        if img is None:
+            return err("Failed to read image", 400)
+        h, w = img.shape[:2]
+        lap("decode")
+
+        # 2) détection (étape partagée : micro-batching)
+        try:
+            detections = parse_detections(run_detection(self.yolo, self.batcher, img, cfg))
+        except queue.Full:
+            return err("Detection queue full, retry later", 503)
+        except FutureTimeout:
+            return err("Detection timed out", 504)
+        except Exception as e:
+            return err("YOLO inference failed", 500, {"error": str(e)})
+        lap("detect")
+
+        # 3) descripteurs des détections retenues, sur la même image
+        selected = [d for d in detections if d["confidence"] >= min_conf]
+        selected = sorted(selected, key=lambda d: -d["confidence"])[:cfg["DESCRIBE_MAX_BOXES"]]
+        self._describe(img, selected, mode)
+        lap("describe")
+
+        # 4) insertion optionnelle dans l'index FAISS par classe
+        indexed, index_errors = {}, {}
+        if do_index:
+            by_class = self._group(detections, selected)
+            mismatched = self._check_dims(by_class)
+            if mismatched:
+                # rien n'est inséré : pas d'index à moitié à jour
+                return err("FAISS dim mismatch, nothing indexed", 400, {"classes": mismatched})
+            indexed, index_errors = self._insert(by_class, image_id)
+            lap("index")
+
+        described = sum(1 for d in selected if "descriptors" in d)
+        return ok({
+            "image": {"width": w, "height": h},
+            "model": self.yolo.model_name,
+            "backend": self.yolo.backend,
+            "min_conf": min_conf,
+            "mode": mode,
+            "detections": detections,
+            "count": len(detections),
+            "described": described,
+            "failed": len(selected) - described,
+            "indexed": indexed,
+            "index_errors": index_errors,
+            "timings_ms": timings
+        })
+
+    def _describe(self, img, selected, mode):
+        """
+        Ajoute "descriptors" (ou "error") à chaque détection retenue
+        """
+        if not selected:
+            return
+        if mode == "multi":
+            results = self.feat.describe_objects(img, [d["bbox_xyxy"] for d in selected])
+            descs = [desc for _, desc in results]
+        else:
+            crops = [crop_xyxy(img, d["bbox_xyxy"])[0] for d in selected]
+            if self.executor is not None:
+                descs = self.executor.describe_many(crops)
+            else:
+                descs = []
+                for crop in crops:
+                    try:
+                        descs.append(self.feat.describe_object(crop))
+                    except Exception as e:
+                        descs.append(e)
+
+        for det, desc in zip(selected, descs):
+            if isinstance(desc, Exception):
+                det["error"] = str(desc)
+            else:
+                det["descriptors"] = desc
+
+    @staticmethod
+    def _group(detections, selected):
+        """
+        {class_id: [(position dans detections de la réponse, détection décrite), ...]}
+        selected est filtré (min_conf) et trié par confiance : la position
+        est prise dans detections (par identité, deux boîtes peuvent être égales)
+        """
+        positions = {id(det): i for i, det in enumerate(detections)}
+        by_class = {}
+        for det in selected:
+            if "descriptors" not in det:
+                continue
+            by_class.setdefault(det["class_id"], []).append((positions[id(det)], det))
+        return by_class
+
+    def _check_dims(self, by_class):
+        """
+        Dimension de chaque classe vérifiée avant toute insertion
+        (add_batch persiste classe par classe)
+
+        Returns:
+            {class_id: {"index_dim", "vector_dim"}} des classes incompatibles
+        """
+        mismatched = {}
+        for class_id, items in by_class.items():
+            dim = len(items[0][1]["descriptors"]["feature_vector"])
+            expected = self.index.dim_for(class_id)
+            if expected is not None and expected != dim:
+                mismatched[str(class_id)] = {"index_dim": int(expected), "vector_dim": dim}
+        return mismatched
+
+    def _insert(self, by_class, image_id):
+        """
+        Un add_batch par classe ; metadata = origine de chaque vecteur.
+        Une classe en échec n'annule pas les autres (déjà persistées).
+
+        Returns:
+            ({class_id: nb de vecteurs ajoutés}, {class_id: erreur})
+        """
+        indexed, errors = {}, {}
+        for class_id, items in by_class.items():
+            vectors = np.array([det["descriptors"]["feature_vector"] for _, det in items], dtype=np.float32)
+            meta = [{
+                "image_id": image_id,
+                "detection_index": i,
+                "class_name": det["class_name"],
+                "confidence": det["confidence"],
+                "bbox_xyxy": det["bbox_xyxy"],
+            } for i, det in items]
+            try:
+                self.index.add_batch(class_id, vectors, meta)
+            except Exception as e:
+                errors[str(class_id)] = str(e)
+                continue
+            indexed[str(class_id)] = len(items)
+            for _, det in items:
+                det["indexed"] = True
+        return indexed, errors
@@ -1,16 +1,27 @@
-import os
+import queue
+import shutil
 import tempfile
-import numpy as np
 from flask_restful import Resource
 from flask import request, current_app
 
 from utils.responses import ok, err
+from utils.archive_io import extract_obj_archive, read_labels_csv
+from services.shape3d_index_service import compute_multi_bytes, index_many, descriptor_params
+from services.shape3d_descriptor_cache import bytes_sha1
+from services.shape3d_loader import mesh_format
 
-from services.shape3d_index_service import Shape3DIndexService
-from services.shape3d_loader import Shape3DLoader
-from services.shape3d_normalizer import Shape3DNormalizer
-from services.shape_context_3d import ShapeContext3D
-from services.shape3d_matching import aggregate_descriptor
+
+
+def _form_list(name):
+    """
+    Champ de formulaire multi-valeurs : "a,b" ou name=a&name=b
+    """
+    return [
+        v.strip()
+        for raw in request.form.getlist(name)
+        for v in raw.split(",")
+        if v.strip()
+    ]
 
 
 # ==========================================================
@@ -18,105 +29,250 @@ from services.shape3d_matching import aggregate_descriptor
 # ==========================================================
 class Index3DResource(Resource):
     """
-    POST /index-3d/add
-    Ajout dynamique d'un modèle 3D à FAISS
+    POST /index-3d
+    Ajout dynamique d'un modèle 3D à FAISS (index de chaque moteur),
+    en tâche de fond : réponse immédiate (202) avec job_id, suivi via
+    GET /jobs/<job_id>
+    Formats : .obj, .ply, .glb, .stl, .off (et .gz), lus en mémoire
     """
 
+    def __init__(self, shape3d_services, job_queue):
+        self.services = list(shape3d_services.values())
+        self.jobs = job_queue
+
     def post(self):
-        try:
-            if "file" not in request.files:
-                return err("Fichier .obj manquant", 400)
+        if "file" not in request.files:
+            return err("Fichier 3D manquant", 400)
 
-            file = request.files["file"]
-            label = request.form.get("label", "Unknown")
+        file = request.files["file"]
+        label = request.form.get("label", "Unknown")
+        filename = file.filename
 
-            tmp = tempfile.NamedTemporaryFile(
-                delete=False,
-                suffix=".obj",
-                dir=current_app.config["TMP_DIR"]
+        try:
+            mesh_format(filename)
+        except ValueError as e:
+            return err(str(e), 400)
+
+        try:
+            data = file.read()
+            # descripteurs (tous moteurs, un seul parse) calculés dans
+            # un processus, insertion dans le thread worker
+            job_id = self.jobs.submit(
+                "index-3d",
+                compute_multi_bytes,
+                args=(data, filename, [svc.params for svc in self.services]),
+                then=lambda res: self._insert(filename, label, res),
+                in_process=True
             )
-            file.save(tmp.name)
+        except queue.Full:
+            return err("File d'indexation pleine, réessayez plus tard", 503)
+        except Exception as e:
+            return err("Indexation dynamique échouée", 500, {"error": str(e)})
 
-            svc = Shape3DIndexService()
-            meta = svc.add_one(tmp.name, label)
+        return ok({
+            "message": "Indexation en file d'attente",
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
+        }, 202)
 
-            os.unlink(tmp.name)
+    def _insert(self, filename, label, descs):
+        added = [
+            svc.add_descriptors(filename, label, *d)
+            for svc, d in zip(self.services, descs)
+        ]
+        return {**added[0], "engines": [svc.params["engine"] for svc in self.services]}
 
-            return ok({
-                "message": "Modèle indexé avec succès",
-                "model": meta
-            })
 
-        except Exception as e:
-            return err("Indexation dynamique échouée", 500, {"error": str(e)})
+# ==========================================================
+# INDEXATION 3D EN MASSE (ARCHIVE ZIP / TAR)
+# ==========================================================
+class Index3DBulkResource(Resource):
+    """
+    POST /index-3d/bulk
+    form-data:
+      - archive: .zip / .tar / .tar.gz de fichiers .obj
+      - labels: CSV filename,label (optionnel, sinon labels.csv dans l'archive)
+    Extraction parallèle, un seul ajout FAISS, une seule persistance
+    par moteur. Traité en tâche de fond (202 + job_id, voir GET /jobs/<job_id>).
+    """
 
+    def __init__(self, shape3d_services, job_queue):
+        self.services = list(shape3d_services.values())
+        self.jobs = job_queue
+
+    def post(self):
+        if "archive" not in request.files:
+            return err("Archive manquante (champ 'archive')", 400)
+
+        archive = request.files["archive"]
+        cfg = current_app.config
+
+        tmp_dir = tempfile.mkdtemp(dir=cfg["TMP_DIR"])
+        try:
+            objs, labels = extract_obj_archive(archive.stream, archive.filename, tmp_dir)
+            if "labels" in request.files:
+                labels.update(read_labels_csv(request.files["labels"].stream))
+
+            if not objs:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return err("Aucun fichier .obj dans l'archive", 400)
+
+            items = [
+                (path, fname, labels.get(fname, "Unknown"))
+                for path, fname in objs
+            ]
+            job_id = self.jobs.submit(
+                "index-3d-bulk",
+                self._run,
+                args=(items, cfg["SHAPE3D_BULK_WORKERS"]),
+                cleanup=lambda: shutil.rmtree(tmp_dir, ignore_errors=True)
+            )
+
+        except queue.Full:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return err("File d'indexation pleine, réessayez plus tard", 503)
+        except ValueError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return err(str(e), 400)
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return err("Indexation en masse échouée", 500, {"error": str(e)})
+
+        return ok({
+            "message": f"{len(items)} modèles en file d'attente",
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
+        }, 202)
+
+    def _run(self, items, workers):
+        results = index_many(self.services, items, workers=workers)
+        indexed = sum(1 for r in results if r["success"])
+        return {
+            "engines": [svc.params["engine"] for svc in self.services],
+            "indexed": indexed,
+            "failed": len(results) - indexed,
+            "results": results
+        }
 
 
 # ==========================================================
 # RECHERCHE PAR SIMILARITÉ 3D
 # ==========================================================
 class Search3DResource(Resource):
+    """
+    POST /search-3d
+    form-data: file (.obj, .ply, .glb, .stl, .off, éventuellement .gz), top_k, rerank, engine (défaut : SHAPE3D_DEFAULT_ENGINE),
+               labels / exclude_labels (liste séparée par des virgules ou champ répété)
+    Les descripteurs de requête sont mis en cache par hash du contenu uploadé.
+
+    GET /search-3d : moteurs disponibles + statistiques du cache
+    """
+
+    def __init__(self, shape3d_services, query_cache, default_engine="shape_context"):
+        self.services = shape3d_services
+        self.cache = query_cache
+        self.default_engine = default_engine
+
+    def get(self):
+        return ok({
+            "engines": {engine: svc.size() for engine, svc in self.services.items()},
+            "default_engine": self.default_engine,
+            "cache": self.cache.stats()
+        })
 
     def post(self):
+        if "file" not in request.files:
+            return err("Fichier 3D manquant", 400)
+
+        file = request.files["file"]
         try:
-            if "file" not in request.files:
-                return err("Fichier .obj manquant", 400)
+            mesh_format(file.filename)
+        except ValueError as e:
+            return err(str(e), 400)
 
-            file = request.files["file"]
+        # validés avant le pipeline : une ValueError plus bas signifie
+        # un modèle illisible, pas un paramètre invalide
+        try:
             top_k = int(request.form.get("top_k", 10))
+            # rerank > 0 : re-classement des N premiers candidats FAISS
+            # par matching des descripteurs locaux (chi2)
+            rerank = int(request.form.get("rerank", 0))
+        except ValueError:
+            return err("Paramètres 'top_k' / 'rerank' invalides (entiers attendus)", 400)
+        if top_k < 1 or rerank < 0:
+            return err("'top_k' doit être >= 1 et 'rerank' >= 0", 400)
 
-            # --------------------------------------------------
-            # 1. Sauvegarde temporaire
-            # --------------------------------------------------
-            tmp = tempfile.NamedTemporaryFile(
-                delete=False,
-                suffix=".obj",
-                dir=current_app.config["TMP_DIR"]
-            )
-            file.save(tmp.name)
+        try:
+            # moteur de descripteurs (compromis vitesse / précision)
+            engine = request.form.get("engine", self.default_engine)
+            svc = self.services.get(engine)
+            if svc is None:
+                return err(
+                    f"Moteur 3D inconnu : {engine}",
+                    400,
+                    {"engines": list(self.services)}
+                )
+
+            # filtres par catégorie : seules les partitions retenues sont parcourues
+            labels = _form_list("labels")
+            exclude_labels = _form_list("exclude_labels")
 
             # --------------------------------------------------
-            # 2. Pipeline 3D
+            # 1. Cache (hash du contenu + paramètres du descripteur)
             # --------------------------------------------------
-            pts = Shape3DLoader.load_obj(tmp.name)
-            pts = Shape3DNormalizer.normalize(pts)
-
-            sc = ShapeContext3D()
-
-            num_points = min(50, pts.shape[0])
-            ref_idx = np.random.choice(
-                pts.shape[0],
-                num_points,
-                replace=False
-            )
-
-            local_desc = np.array([
-                sc.compute(pts, i) for i in ref_idx
-            ])
+            data = file.read()
+            content_hash = bytes_sha1(data)
+            params = descriptor_params(svc.params)
+
+            cached = self.cache.get(content_hash, params)
+            if cached is None:
+                # --------------------------------------------------
+                # 2. Pipeline 3D (parse en mémoire, sans fichier temporaire)
+                # --------------------------------------------------
+                cached = svc.describe_bytes(
+                    data,
+                    file.filename,
+                    cache_dir=current_app.config["SHAPE3D_POINTS_CACHE_DIR"] or None,
+                    content_hash=content_hash
+                )
+                self.cache.put(content_hash, params, *cached)
+                cache_status = "miss"
+            else:
+                cache_status = "hit"
 
-            query_desc = aggregate_descriptor(local_desc)
+            local_desc, query_desc = cached
 
             # --------------------------------------------------
-            # 3. Index FAISS (AUTO-BUILD SI ABSENT)
+            # 3. Index FAISS (en mémoire, partagé)
             # --------------------------------------------------
-            svc = Shape3DIndexService()
-
-            if not os.path.exists(svc.index_path):
+            if svc.size() == 0:
                 return err(
                     "Index 3D inexistant. Veuillez indexer les modèles uploadés.",
                     400
                 )
 
-            results = svc.search(query_desc, top_k=top_k)
-
-            os.unlink(tmp.name)
+            results = svc.search(
+                query_desc,
+                top_k=top_k,
+                query_local=local_desc,
+                rerank_k=rerank,
+                labels=labels,
+                exclude_labels=exclude_labels
+            )
 
             return ok({
-                "query_points": pts.shape[0],
+                "engine": engine,
+                "query_points": svc.params["sample_points"],
                 "top_k": top_k,
+                "rerank": rerank,
+                "labels": labels,
+                "exclude_labels": exclude_labels,
+                "cache": cache_status,
                 "results": results
             })
 
+        except ValueError as e:
+            return err("Modèle 3D illisible", 400, {"error": str(e)})
         except Exception as e:
             return err("Recherche 3D échouée", 500, {"error": str(e)})
 
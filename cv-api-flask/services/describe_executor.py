@@ -0,0 +1,269 @@
+# services/describe_executor.py
+import os
+import queue
+import atexit
+import threading
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import cv2
+
+from services.feature_service import FeatureService
+
+MODES = ("inline", "thread", "process")
+
+# --- état d'un processus worker ---
+_worker_feat = None
+_worker_limits = None
+
+
+def _init_worker(threads, ready):
+    """
+    Initialisation d'un worker : chauffe le FeatureService (banc de
+    Gabor, tables OpenCV, imports), plafonne OpenCV et les pools BLAS /
+    OpenMP à `threads` threads (N workers x threads <= nb de coeurs),
+    puis signale son pid sur la file ready.
+    Les plafonds passent par initargs et threadpoolctl, pas par
+    l'environnement du parent (partagé avec les threads Flask).
+    """
+    global _worker_feat, _worker_limits
+    cv2.setNumThreads(threads)
+
+    _worker_feat = FeatureService()
+    _worker_feat.describe_object(np.full((64, 64, 3), 127, dtype=np.uint8))
+
+    # après la chauffe : threadpoolctl ne plafonne que les bibliothèques
+    # déjà chargées, y compris celles importées à la première extraction
+    try:
+        from threadpoolctl import threadpool_limits
+        _worker_limits = threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+    ready.put(os.getpid())
+
+
+def _ping():
+    return os.getpid()
+
+
+def _describe_shared(name, shape, dtype):
+    """
+    Extraction dans le worker : le crop est lu directement dans le
+    segment de mémoire partagée (pas de pickling de l'image)
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        crop = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        try:
+            return _worker_feat.describe_object(crop)
+        finally:
+            del crop
+    finally:
+        shm.close()
+
+
+class DescribeExecutor:
+    """
+    Exécution de FeatureService.describe_object pour /describe :
+    - inline  : dans le thread de la requête (comportement historique)
+    - thread  : pool de threads borné (limite la concurrence d'extraction)
+    - process : pool de processus chauffés ; le crop passe par
+                shared_memory, seul le dict de descripteurs revient
+                par pickle. Hors GIL du serveur Flask.
+    Les plafonds de threads BLAS / OpenMP / OpenCV (threads) ne
+    s'appliquent qu'aux workers processus.
+    """
+
+    def __init__(self, mode="inline", workers=None, threads=1, start_method="spawn"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown describe executor '{mode}' (expected one of {MODES})")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = max(1, threads)
+        self.start_method = start_method
+        self._lock = threading.Lock()
+        self._feat = FeatureService()
+        self._pool = None
+        self._ready = None
+        self._ready_pids = []
+        self._ready_lock = threading.Lock()
+
+        self.completed = 0
+        self.failed = 0
+
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="describe")
+        elif mode == "process":
+            self._pool = self._new_process_pool()
+            # pool arrêté proprement avant la fin de l'interpréteur
+            atexit.register(self.shutdown)
+
+    def _new_process_pool(self):
+        # spawn par défaut : pas de fork d'un parent multi-thread
+        # (Flask, torch/OpenMP déjà initialisés)
+        ctx = mp.get_context(self.start_method)
+        self._ready = ctx.Queue()
+        self._ready_pids = []
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.threads, self._ready)
+        )
+        # un ping par worker : le pool démarre (et chauffe) tous ses
+        # processus tout de suite au lieu de la première requête
+        for _ in range(self.workers):
+            pool.submit(_ping)
+        return pool
+
+    def ready_workers(self):
+        """
+        Nb de workers processus démarrés et chauffés (non bloquant)
+        """
+        if self.mode != "process":
+            return 0
+        with self._ready_lock:
+            while True:
+                try:
+                    self._ready_pids.append(self._ready.get_nowait())
+                except queue.Empty:
+                    return len(self._ready_pids)
+
+    def warmup(self, timeout=None):
+        """
+        Attend que tous les workers processus soient chauffés
+
+        Returns:
+            pids des workers
+        """
+        if self.mode != "process":
+            return []
+        with self._ready_lock:
+            while len(self._ready_pids) < self.workers:
+                self._ready_pids.append(self._ready.get(timeout=timeout))
+            return sorted(self._ready_pids)
+
+    def describe(self, crop_bgr):
+        """
+        Bloquant ; les exceptions de l'extraction sont propagées
+        """
+        try:
+            if self.mode == "inline":
+                desc = self._feat.describe_object(crop_bgr)
+            elif self.mode == "thread":
+                desc = self._pool.submit(self._feat.describe_object, crop_bgr).result()
+            else:
+                desc = self._describe_in_process(crop_bgr)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return desc
+
+    def describe_many(self, crops):
+        """
+        Plusieurs crops (ex. toutes les détections d'une image) : soumis
+        ensemble au pool (thread / process), extraits en parallèle.
+
+        Returns:
+            liste (ordre des crops) de descripteurs | Exception
+        """
+        if self.mode == "inline":
+            jobs = [(None, crop) for crop in crops]
+        elif self.mode == "thread":
+            jobs = [(self._pool.submit(self._feat.describe_object, crop), None) for crop in crops]
+        else:
+            jobs = []
+            for crop in crops:
+                try:
+                    jobs.append((self._submit_shared(crop), None))
+                except Exception as e:
+                    jobs.append((None, e))
+
+        out = []
+        for job, crop in jobs:
+            try:
+                if isinstance(crop, Exception):
+                    raise crop
+                if job is None:
+                    out.append(self._feat.describe_object(crop))
+                elif self.mode == "thread":
+                    out.append(job.result())
+                else:
+                    out.append(self._collect_shared(*job))
+            except Exception as e:
+                out.append(e)
+
+        n_failed = sum(isinstance(d, Exception) for d in out)
+        with self._lock:
+            self.completed += len(out) - n_failed
+            self.failed += n_failed
+        return out
+
+    def _describe_in_process(self, crop_bgr):
+        return self._collect_shared(*self._submit_shared(crop_bgr))
+
+    def _submit_shared(self, crop_bgr):
+        """
+        Copie le crop dans un segment partagé et soumet l'extraction
+
+        Returns:
+            (future, segment, pool)
+        """
+        if crop_bgr is None or crop_bgr.size == 0:
+            raise ValueError("Empty crop")
+
+        crop = np.ascontiguousarray(crop_bgr)
+        shm = shared_memory.SharedMemory(create=True, size=crop.nbytes)
+        try:
+            np.ndarray(crop.shape, dtype=crop.dtype, buffer=shm.buf)[...] = crop
+            pool = self._pool
+            try:
+                future = pool.submit(_describe_shared, shm.name, crop.shape, crop.dtype.str)
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+                raise
+            return future, shm, pool
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+    def _collect_shared(self, future, shm, pool):
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _replace_pool(self, pool):
+        # worker tué (OOM...) : nouveau pool pour les requêtes suivantes
+        with self._lock:
+            if self._pool is pool:
+                self._pool = self._new_process_pool()
+
+    def info(self):
+        ready = self.ready_workers()
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.workers if self.mode != "inline" else 0,
+                "threads_per_worker": self.threads if self.mode == "process" else None,
+                "ready_workers": ready,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        # wait=True : sans attendre le thread de gestion du pool, il écrit
+        # dans des pipes déjà fermés à la sortie (OSError)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
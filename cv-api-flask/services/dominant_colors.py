@@ -0,0 +1,106 @@
+# services/dominant_colors.py
+import numpy as np
+
+
+class ColorHistogram:
+    """
+    Pré-quantification des couleurs d'un crop : chaque pixel tombe dans
+    une case BGR (levels^3) ; on garde par case le nombre de pixels et les
+    couleurs moyennes (LAB / RGB). Le k-means travaille ensuite sur
+    quelques centaines de cases pondérées au lieu de dizaines de milliers
+    de pixels, sans sous-échantillonnage aléatoire.
+    """
+
+    def __init__(self, bgr, levels=16):
+        self.levels = levels
+        q = (bgr.reshape(-1, 3).astype(np.int64) * levels) // 256
+        self.bins = (q[:, 0] * levels + q[:, 1]) * levels + q[:, 2]
+        self.n_bins = levels ** 3
+
+    def summarize(self, values, mask=None):
+        """
+        Returns:
+            (moyennes (m, C) des cases non vides, effectifs (m,))
+        """
+        bins = self.bins if mask is None else self.bins[mask]
+        values = values.reshape(-1, values.shape[-1]).astype(np.float64)
+        if mask is not None:
+            values = values[mask]
+
+        counts = np.bincount(bins, minlength=self.n_bins)
+        keep = np.flatnonzero(counts)
+        sums = np.stack([
+            np.bincount(bins, weights=values[:, c], minlength=self.n_bins)[keep]
+            for c in range(values.shape[1])
+        ], axis=1)
+        counts = counts[keep].astype(np.float64)
+        return sums / counts[:, None], counts
+
+
+def peak_init(points, weights, k, min_dist):
+    """
+    Centres initiaux = pics de l'histogramme : cases les plus peuplées,
+    en ignorant celles à moins de min_dist d'un pic déjà retenu
+    """
+    order = np.argsort(-weights, kind="stable")
+    chosen = []
+    for i in order:
+        if all(np.sum((points[i] - points[j]) ** 2) >= min_dist ** 2 for j in chosen):
+            chosen.append(i)
+            if len(chosen) == k:
+                break
+    # pas assez de pics distincts : cases suivantes par effectif
+    for i in order:
+        if len(chosen) == k:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    return points[chosen].copy()
+
+
+def weighted_kmeans(points, weights, k, min_dist=16.0, max_iter=20, tol=1e-3, seed=0):
+    """
+    k-means pondéré vectorisé (Lloyd), initialisé sur les pics de
+    l'histogramme, nb d'itérations borné.
+    Un cluster vide est ré-ensemencé sur une case tirée au hasard
+    (graine fixe : résultat reproductible).
+
+    Returns:
+        (centres (k, C), poids (k,) normalisés), triés par poids décroissant
+    """
+    rng = np.random.default_rng(seed)
+    n = len(points)
+    centers = peak_init(points, weights, min(k, n), min_dist)
+
+    for _ in range(max_iter):
+        d = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = d.argmin(axis=1)
+        w = np.bincount(labels, weights=weights, minlength=len(centers))
+        sums = np.stack([
+            np.bincount(labels, weights=weights * points[:, c], minlength=len(centers))
+            for c in range(points.shape[1])
+        ], axis=1)
+
+        new = centers.copy()
+        filled = w > 0
+        new[filled] = sums[filled] / w[filled, None]
+        for j in np.flatnonzero(~filled):
+            new[j] = points[rng.integers(n)]
+
+        shift = float(np.abs(new - centers).max())
+        centers = new
+        if shift < tol:
+            break
+
+    labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    w = np.bincount(labels, weights=weights, minlength=len(centers))
+    w = w / max(1.0, float(w.sum()))
+
+    # moins de cases que k : dimension fixe, centres complétés avec un poids nul
+    if len(centers) < k:
+        pad = k - len(centers)
+        centers = np.vstack([centers, np.repeat(centers[-1:], pad, axis=0)])
+        w = np.concatenate([w, np.zeros(pad)])
+
+    order = np.argsort(-w, kind="stable")
+    return centers[order], w[order]
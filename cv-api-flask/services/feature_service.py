@@ -1,12 +1,200 @@
+import time
 import numpy as np
 import cv2
-from sklearn.cluster import KMeans
-from skimage.filters import gabor
+from functools import cached_property
 from skimage.feature import local_binary_pattern
 from scipy import ndimage as ndi
 
-from utils.cv_ops import l2_normalize
-from sklearn.cluster import MiniBatchKMeans
+from utils.cv_ops import l2_normalize, clamp_bbox_xyxy
+from services.gabor_bank import get_gabor_bank
+from services.dominant_colors import ColorHistogram, weighted_kmeans
+
+
+class CropContext:
+    """
+    Représentations d'un crop partagées par tous les blocs de descripteurs :
+    chaque espace couleur / carte de gradients est calculé au premier accès,
+    une seule fois.
+    """
+
+    def __init__(self, bgr):
+        self.bgr = bgr
+
+    @cached_property
+    def gray(self):
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def gray_f(self):
+        return self.gray.astype(np.float32) / 255.0
+
+    @cached_property
+    def hsv(self):
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+
+    @cached_property
+    def rgb(self):
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+
+    @cached_property
+    def lab(self):
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2LAB)
+
+    @cached_property
+    def color_hist(self):
+        """
+        Pré-quantification BGR partagée par les couleurs dominantes
+        """
+        return ColorHistogram(self.bgr, levels=FeatureService.DOM_COLORS_LEVELS)
+
+    @cached_property
+    def gray_gradients(self):
+        """
+        (mag, ang) Sobel du niveau de gris [0,1] ; ang dans [0, 2pi]
+        """
+        return _sobel_polar(self.gray_f)
+
+    @cached_property
+    def edges(self):
+        return cv2.Canny(self.gray, 80, 160)
+
+    @cached_property
+    def edge_gradients(self):
+        """
+        (mag, ang) Sobel de la carte de contours Canny
+        """
+        return _sobel_polar(self.edges.astype(np.float32))
+
+    @cached_property
+    def energy_maps(self):
+        """
+        Magnitude de gradient lissée à plusieurs échelles (Tamura coarseness)
+        """
+        mag, _ = self.gray_gradients
+        return [ndi.gaussian_filter(mag, sigma=sigma) for sigma in (1.0, 2.0, 4.0)]
+
+    @cached_property
+    def adaptive_thr(self):
+        return cv2.adaptiveThreshold(self.gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 31, 2)
+
+    @cached_property
+    def lbp(self):
+        return local_binary_pattern(self.gray, P=FeatureService.LBP_P,
+                                    R=FeatureService.LBP_R, method=FeatureService.LBP_METHOD)
+
+    @cached_property
+    def gabor_responses(self):
+        """
+        (n_filtres, H, W) réponses réelles du banc de Gabor (float32)
+        """
+        return _gabor_bank().responses(self.gray_f, dtype=np.float32)
+
+    def gabor_stats(self):
+        return _gabor_bank().stats(self.gray_f)
+
+    def lbp_counts(self, n_bins):
+        hist, _ = np.histogram(self.lbp.ravel(), bins=n_bins, range=(0, n_bins), density=False)
+        return hist
+
+    @cached_property
+    def lbp_integral(self):
+        """
+        Histogramme intégral des codes LBP : (n_bins, H+1, W+1) int32
+        """
+        n_bins = FeatureService.LBP_P + 2
+        return np.stack([
+            cv2.integral((self.lbp == code).astype(np.uint8))
+            for code in range(n_bins)
+        ])
+
+
+class RegionContext:
+    """
+    Mode multi-crop : vue d'une boîte sur le CropContext de l'image entière.
+    Les cartes (couleurs, gradients, Canny, LBP, Gabor) sont calculées une
+    fois sur toute l'image puis découpées par boîte ; l'histogramme LBP est
+    lu en O(1) dans l'histogramme intégral.
+
+    Différences avec l'extraction crop par crop (describe_object) :
+    - échelle : les cartes viennent d'une seule réduction de l'image
+      entière (max_side) au lieu d'un redimensionnement de chaque crop à
+      256 px ; quand l'image est réduite, une boîte n'est plus à
+      l'échelle du crop : Tamura et l'histogramme d'orientations
+      s'écartent le plus (gradients / contours dépendent de l'échelle) ;
+    - bords : les filtres (Gabor, Sobel, gaussien, LBP) et Canny voient
+      les vrais pixels autour de la boîte au lieu d'un bord miroir /
+      constant : écart limité à une bande de quelques pixels ;
+    - Gabor calculé en float32 (écart ~1e-7).
+    Hu (seuil adaptatif + plus grand contour, très sensible à l'échelle)
+    est calculé sur hu_crop : la boîte découpée dans l'image d'origine et
+    réduite à 256 px comme dans describe_object, donc identique.
+    Tolérances par bloc vérifiées par benchmark_describe.py (avec et
+    sans réduction de l'image).
+    """
+
+    _MAPS = ("gray", "gray_f", "hsv", "rgb", "lab", "edges", "lbp")
+
+    def __init__(self, full, box, hu_crop):
+        x1, y1, x2, y2 = box
+        self.hu_crop = hu_crop
+        self.full = full
+        self.box = box
+        self.sl = (slice(y1, y2), slice(x1, x2))
+
+    @property
+    def bgr(self):
+        return self.full.bgr[self.sl]
+
+    def __getattr__(self, name):
+        if name in RegionContext._MAPS:
+            return getattr(self.full, name)[self.sl]
+        raise AttributeError(name)
+
+    @cached_property
+    def color_hist(self):
+        return ColorHistogram(self.bgr, levels=FeatureService.DOM_COLORS_LEVELS)
+
+    @property
+    def adaptive_thr(self):
+        # même chemin que describe_object (crop d'origine réduit à 256 px) :
+        # le plus grand contour dépend fortement de l'échelle et du seuil local
+        return CropContext(self.hu_crop).adaptive_thr
+
+    @property
+    def gray_gradients(self):
+        return tuple(m[self.sl] for m in self.full.gray_gradients)
+
+    @property
+    def edge_gradients(self):
+        return tuple(m[self.sl] for m in self.full.edge_gradients)
+
+    @property
+    def energy_maps(self):
+        return [m[self.sl] for m in self.full.energy_maps]
+
+    def gabor_stats(self):
+        r = self.full.gabor_responses[(slice(None),) + self.sl]
+        mean = r.mean(axis=(1, 2), dtype=np.float64)
+        var = r.var(axis=(1, 2), dtype=np.float64)
+        return np.stack([mean, var], axis=1).ravel()
+
+    def lbp_counts(self, n_bins):
+        x1, y1, x2, y2 = self.box
+        I = self.full.lbp_integral
+        return I[:, y2, x2] - I[:, y1, x2] - I[:, y2, x1] + I[:, y1, x1]
+
+
+def _gabor_bank():
+    return get_gabor_bank(tuple(FeatureService.GABOR_FREQS), tuple(FeatureService.GABOR_THETAS))
+
+
+def _sobel_polar(img):
+    gx = cv2.Sobel(img, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(img, cv2.CV_32F, 0, 1, ksize=3)
+    mag = np.sqrt(gx * gx + gy * gy) + 1e-12
+    ang = (np.arctan2(gy, gx) + np.pi)  # [0,2pi]
+    return mag, ang
 
 
 class FeatureService:
@@ -24,7 +212,9 @@ class FeatureService:
 
     #  AJOUT: nombre de couleurs dominantes "visuelles" (UI)
     DOM_COLORS_VIS_K = 5
-    DOM_COLORS_SAMPLE = 8000  # sample pixels pour accélérer
+    DOM_COLORS_LEVELS = 16    # pré-quantification BGR 16^3 cases (remplace l'échantillonnage)
+    DOM_COLORS_MAX_ITER = 20
+    DOM_COLORS_SEED = 0
 
     GABOR_FREQS = [0.1, 0.2, 0.3]
     GABOR_THETAS = [0, np.pi/6, 2*np.pi/6, 3*np.pi/6, 4*np.pi/6, 5*np.pi/6]  # 6 orientations
@@ -34,30 +224,86 @@ class FeatureService:
     LBP_R = 1
     LBP_METHOD = "uniform"  # hist taille fixe
 
-    def describe_object(self, crop_bgr):
+    MULTI_MAX_SIDE = 640   # mode multi-crop : réduction de l'image entière
+
+    def describe_object(self, crop_bgr, profile=False):
+        """
+        profile=True : ajoute "timings_ms" (temps par bloc de descripteurs)
+        """
         if crop_bgr is None or crop_bgr.size == 0:
             raise ValueError("Empty crop")
 
         # Resize pour stabilité (évite vecteurs instables sur tailles extrêmes)
         crop_bgr = self._safe_resize(crop_bgr, max_side=256)
 
-        # Descripteurs
-        color_hist = self._color_hist_hsv(crop_bgr)
+        # espaces couleur / gradients calculés à la demande, une seule fois
+        return self._describe(CropContext(crop_bgr), profile)
 
-        # --- dominant colors ---
-        # (1) garde ton vecteur LAB (pour index/FAISS)
-        dom_colors = self._dominant_colors_lab(crop_bgr, k=self.DOM_COLORS_K)
+    def describe_objects(self, img_bgr, boxes, max_side=None):
+        """
+        Mode multi-crop : cartes de texture / gradients calculées une fois
+        sur l'image entière (réduite à max_side), puis statistiques par
+        boîte (voir RegionContext pour les différences avec describe_object).
 
-        #  AJOUT (2) couleurs dominantes VISUELLES en RGB + ratios (pour UI)
-        dom_rgb, dom_ratio = self._dominant_colors_rgb(crop_bgr, k=self.DOM_COLORS_VIS_K)
+        Args:
+            boxes: liste de [x1, y1, x2, y2] (coordonnées de img_bgr)
 
-        gabor_vec = self._gabor_stats(crop_bgr)
-        tamura = self._tamura_simple(crop_bgr)
-        hu = self._hu_moments(crop_bgr)
-        orient_hist = self._contour_orientation_hist(crop_bgr, bins=self.ORIENT_BINS)
+        Returns:
+            liste (ordre des boîtes) de (bbox_xyxy clampée, descripteurs | Exception)
+        """
+        if img_bgr is None or img_bgr.size == 0:
+            raise ValueError("Empty image")
+
+        h, w = img_bgr.shape[:2]
+        small = self._safe_resize(img_bgr, max_side=max_side or self.MULTI_MAX_SIDE)
+        sh, sw = small.shape[:2]
+        sx, sy = sw / w, sh / h
+
+        full = CropContext(small)
+        out = []
+        for bbox in boxes:
+            x1, y1, x2, y2 = clamp_bbox_xyxy(bbox, w, h)
+            box = clamp_bbox_xyxy([x1 * sx, y1 * sy, x2 * sx, y2 * sy], sw, sh)
+            try:
+                hu_crop = self._safe_resize(img_bgr[y1:y2, x1:x2], max_side=256)
+                desc = self._describe(RegionContext(full, box, hu_crop))
+            except Exception as e:
+                desc = e
+            out.append(((x1, y1, x2, y2), desc))
+        return out
+
+    def _describe(self, ctx, profile=False):
+        timings = {}
+        t = time.perf_counter()
+
+        def lap(name):
+            nonlocal t
+            now = time.perf_counter()
+            timings[name] = round((now - t) * 1000.0, 3)
+            t = now
+
+        # Descripteurs
+        color_hist = self._color_hist_hsv(ctx)
+        lap("color_hist_hsv")
+
+        # --- dominant colors (un seul histogramme quantifié) ---
+        # (1) vecteur LAB (pour index/FAISS)
+        # (2) couleurs dominantes VISUELLES en RGB + ratios (pour UI)
+        dom_colors, dom_rgb, dom_ratio = self._dominant_colors(ctx)
+        lap("dominant_colors")
+
+        gabor_vec = self._gabor_stats(ctx)
+        lap("gabor")
+        tamura = self._tamura_simple(ctx)
+        lap("tamura")
+        hu = self._hu_moments(ctx)
+        lap("hu_moments")
+        orient_hist = self._contour_orientation_hist(ctx, bins=self.ORIENT_BINS)
+        lap("orientation_hist")
 
         # Méthode supplémentaire (choix robuste) : LBP histogram
-        lbp_hist = self._lbp_hist(crop_bgr)
+        lbp_hist = self._lbp_hist(ctx)
+        lap("lbp_hist")
 
         # --- Fusion (concat) + normalisation par bloc ---
         # Chaque bloc est L2-normalisé pour éviter domination d’un descripteur
@@ -74,7 +320,7 @@ class FeatureService:
         feature_vector = l2_normalize(feature_vector).astype(np.float32)
 
         # JSON friendly
-        return {
+        out = {
             "color_hist_hsv": color_hist.tolist(),
 
             #  garde l'ancien (vecteur LAB + weights)
@@ -92,6 +338,9 @@ class FeatureService:
             "feature_vector": feature_vector.tolist(),
             "feature_dim": int(feature_vector.shape[0]),
         }
+        if profile:
+            out["timings_ms"] = timings
+        return out
 
     # ----------------- Helpers -----------------
 
@@ -104,8 +353,8 @@ class FeatureService:
         new_w, new_h = int(round(w * scale)), int(round(h * scale))
         return cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
 
-    def _color_hist_hsv(self, bgr):
-        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    def _color_hist_hsv(self, ctx):
+        hsv = ctx.hsv
         h_bins, s_bins, v_bins = self.HSV_H_BINS, self.HSV_S_BINS, self.HSV_V_BINS
         hist = cv2.calcHist([hsv], [0, 1, 2], None,
                             [h_bins, s_bins, v_bins],
@@ -116,113 +365,68 @@ class FeatureService:
             hist /= hist_sum
         return hist
 
-    def _dominant_colors_lab(self, bgr, k=3):
-        lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
-        pixels = lab.reshape(-1, 3).astype(np.float32)
-
-        # sous-échantillonnage si image grande
-        if pixels.shape[0] > 20000:
-            idx = np.random.choice(pixels.shape[0], 20000, replace=False)
-            pixels = pixels[idx]
-
-        km = KMeans(n_clusters=k, n_init=5, random_state=0)
-        labels = km.fit_predict(pixels)
-        centers = km.cluster_centers_  # (k,3)
-        counts = np.bincount(labels, minlength=k).astype(np.float32)
-        weights = counts / max(1.0, float(counts.sum()))  # proportions
-
-        # vecteur fixe: [c1L,c1a,c1b, c2..., c3..., w1,w2,w3]
-        vec = np.concatenate([centers.flatten(), weights]).astype(np.float32)
-        return vec
-
-    #  AJOUT: Dominant colors pour affichage UI (RGB)
-    def _dominant_colors_rgb(self, bgr, k=5):
-        """
-        Dominant colors robustes:
-        - convertit en HSV
-        - filtre pixels peu saturés (gris/blanc/noir)
-        - KMeans sur RGB filtré
+    def _dominant_colors(self, ctx):
         """
-        if bgr is None or bgr.size == 0:
-            return [], []
+        Couleurs dominantes, déterministes :
+        histogramme BGR quantifié (ctx.color_hist), puis k-means pondéré
+        initialisé sur les pics de l'histogramme.
 
-        # Resize safe (déjà fait avant)
-        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-
-        pixels_hsv = hsv.reshape(-1, 3).astype(np.float32)
-        pixels_rgb = rgb.reshape(-1, 3).astype(np.float32)
-
-        # Sample pour performance
-        n = pixels_rgb.shape[0]
-        if n > self.DOM_COLORS_SAMPLE:
-            idx = np.random.choice(n, self.DOM_COLORS_SAMPLE, replace=False)
-            pixels_hsv = pixels_hsv[idx]
-            pixels_rgb = pixels_rgb[idx]
-
-        # ✅ filtre saturation (enlève gris/blanc)
-        S = pixels_hsv[:, 1]
-        V = pixels_hsv[:, 2]
+        Returns:
+            (vecteur LAB [c1L,c1a,c1b, c2..., c3..., w1,w2,w3],
+             centres RGB UI [[r,g,b],...], ratios UI), triés par poids
+        """
+        hist = ctx.color_hist
+        seed, max_iter = self.DOM_COLORS_SEED, self.DOM_COLORS_MAX_ITER
+
+        # (1) LAB sur tous les pixels
+        lab_pts, lab_w = hist.summarize(ctx.lab)
+        centers, weights = weighted_kmeans(
+            lab_pts, lab_w, self.DOM_COLORS_K, max_iter=max_iter, seed=seed
+        )
+        lab_vec = np.concatenate([centers.flatten(), weights]).astype(np.float32)
+
+        # (2) UI : filtre saturation (enlève gris/blanc/noir)
+        hsv = ctx.hsv.reshape(-1, 3)
+        rgb = ctx.rgb.reshape(-1, 3)
+        S = hsv[:, 1]
+        V = hsv[:, 2]
 
         # garder pixels "colorés" : saturation > 35 et luminance raisonnable
         mask = (S > 35) & (V > 20) & (V < 245)
 
-        rgb_f = pixels_rgb[mask]
-
         # fallback si trop peu de pixels colorés
-        if rgb_f.shape[0] < 80:
-            mean = pixels_rgb.mean(axis=1)
-            mask2 = (mean > 15) & (mean < 245)
-            rgb_f = pixels_rgb[mask2]
-            if rgb_f.shape[0] < 80:
-                rgb_f = pixels_rgb
-
-        km = MiniBatchKMeans(n_clusters=k, random_state=0, batch_size=2048, n_init="auto")
-        labels = km.fit_predict(rgb_f)
-        centers = km.cluster_centers_
-
-        counts = np.bincount(labels, minlength=k).astype(np.float32)
-        total = float(counts.sum()) if counts.sum() > 0 else 1.0
-        ratios = counts / total
-
-        order = np.argsort(-ratios)
-        centers = centers[order].astype(np.int32)
-        centers = np.clip(centers, 0, 255)
-        ratios = ratios[order]
-
-        return centers.tolist(), ratios.astype(float).tolist()
-
-
-    def _gabor_stats(self, bgr):
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
-        feats = []
-        for f in self.GABOR_FREQS:
-            for theta in self.GABOR_THETAS:
-                real, imag = gabor(gray, frequency=f, theta=theta)
-                # stats robustes
-                feats.append(float(real.mean()))
-                feats.append(float(real.var()))
-        return np.array(feats, dtype=np.float32)
-
-    def _tamura_simple(self, bgr):
+        if mask.sum() < 80:
+            mean = rgb.astype(np.float32).mean(axis=1)
+            mask = (mean > 15) & (mean < 245)
+            if mask.sum() < 80:
+                mask = None
+
+        rgb_pts, rgb_w = hist.summarize(ctx.rgb, mask)
+        centers, ratios = weighted_kmeans(
+            rgb_pts, rgb_w, self.DOM_COLORS_VIS_K, max_iter=max_iter, seed=seed
+        )
+        centers = np.clip(centers.astype(np.int32), 0, 255)
+
+        return lab_vec, centers.tolist(), ratios.astype(float).tolist()
+
+    def _gabor_stats(self, ctx):
+        # banc FFT (noyaux construits une fois par processus) :
+        # [mean, var] de la réponse réelle par (fréquence, orientation)
+        return ctx.gabor_stats().astype(np.float32)
+
+    def _tamura_simple(self, ctx):
         """
         Version simple & stable (académique) :
         - Coarseness approx via énergie gradients à plusieurs échelles
         - Contrast via std / kurtosis-like
         - Directionality via histogramme d'angles de gradient
         """
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+        gray = ctx.gray_f
 
         # gradients
-        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
-        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
-        mag = np.sqrt(gx * gx + gy * gy) + 1e-12
-        ang = (np.arctan2(gy, gx) + np.pi)  # [0,2pi]
-
-        energies = []
-        for sigma in (1.0, 2.0, 4.0):
-            sm = ndi.gaussian_filter(mag, sigma=sigma)
-            energies.append(float(sm.mean()))
+        mag, ang = ctx.gray_gradients
+
+        energies = [float(sm.mean()) for sm in ctx.energy_maps]
         coarseness = float(np.mean(energies))
 
         contrast = float(gray.std())
@@ -238,10 +442,8 @@ class FeatureService:
 
         return np.array([coarseness, contrast, directionality], dtype=np.float32)
 
-    def _hu_moments(self, bgr):
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-        thr = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                    cv2.THRESH_BINARY, 31, 2)
+    def _hu_moments(self, ctx):
+        thr = np.ascontiguousarray(ctx.adaptive_thr)
         contours, _ = cv2.findContours(thr, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         if not contours:
             return np.zeros(7, dtype=np.float32)
@@ -252,14 +454,8 @@ class FeatureService:
         hu = np.sign(hu) * np.log10(np.abs(hu) + 1e-12)
         return hu
 
-    def _contour_orientation_hist(self, bgr, bins=36):
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 80, 160)
-
-        gx = cv2.Sobel(edges.astype(np.float32), cv2.CV_32F, 1, 0, ksize=3)
-        gy = cv2.Sobel(edges.astype(np.float32), cv2.CV_32F, 0, 1, ksize=3)
-        mag = np.sqrt(gx*gx + gy*gy) + 1e-12
-        ang = (np.arctan2(gy, gx) + np.pi)  # [0,2pi]
+    def _contour_orientation_hist(self, ctx, bins=36):
+        mag, ang = ctx.edge_gradients
 
         hist, _ = np.histogram(ang.flatten(), bins=bins, range=(0, 2*np.pi), weights=mag.flatten(), density=False)
         hist = hist.astype(np.float32)
@@ -268,13 +464,9 @@ class FeatureService:
             hist /= s
         return hist
 
-    def _lbp_hist(self, bgr):
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-        lbp = local_binary_pattern(gray, P=self.LBP_P, R=self.LBP_R, method=self.LBP_METHOD)
-
+    def _lbp_hist(self, ctx):
         n_bins = self.LBP_P + 2
-        hist, _ = np.histogram(lbp.ravel(), bins=n_bins, range=(0, n_bins), density=False)
-        hist = hist.astype(np.float32)
+        hist = ctx.lbp_counts(n_bins).astype(np.float32)
         s = float(hist.sum())
         if s > 0:
             hist /= s
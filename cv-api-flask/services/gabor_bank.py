@@ -0,0 +1,94 @@
+# services/gabor_bank.py
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from scipy import fft as sfft
+from skimage.filters import gabor_kernel
+
+
+class GaborBank:
+    """
+    Banc de filtres de Gabor appliqué dans le domaine fréquentiel.
+
+    Équivalent (partie réelle) de skimage.filters.gabor(mode="reflect")
+    pour chaque couple (fréquence, orientation) :
+    - noyaux spatiaux construits une seule fois (gabor_kernel)
+    - image étendue en miroir d'un rayon de noyau (pas de repliement
+      circulaire sur la zone utile), une seule FFT directe
+    - produits point à point + FFT inverses batchées sur tout le banc
+    Les noyaux fréquentiels sont gardés par (taille d'image, précision) (LRU).
+    """
+
+    def __init__(self, freqs, thetas, max_shapes=16):
+        self.kernels = [
+            np.real(gabor_kernel(f, theta=t))
+            for f in freqs
+            for t in thetas
+        ]
+        self.pad = max(max(k.shape) // 2 for k in self.kernels)
+        self.max_shapes = max_shapes
+        self._spectra = OrderedDict()   # ((Hf, Wf), dtype) -> (n, Hf, Wf//2+1) complex
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.kernels)
+
+    def _kernel_spectra(self, shape, dtype=np.float64):
+        key = (shape, np.dtype(dtype).str)
+        with self._lock:
+            spectra = self._spectra.get(key)
+            if spectra is not None:
+                self._spectra.move_to_end(key)
+                return spectra
+
+        # noyau centré sur l'origine (indices négatifs repliés)
+        placed = np.zeros((len(self.kernels),) + shape, dtype=dtype)
+        for i, k in enumerate(self.kernels):
+            ch, cw = k.shape[0] // 2, k.shape[1] // 2
+            rows = np.arange(-ch, ch + 1) % shape[0]
+            cols = np.arange(-cw, cw + 1) % shape[1]
+            placed[i][np.ix_(rows, cols)] = k
+        spectra = sfft.rfft2(placed, axes=(-2, -1))
+
+        with self._lock:
+            self._spectra[key] = spectra
+            while len(self._spectra) > self.max_shapes:
+                self._spectra.popitem(last=False)
+        return spectra
+
+    def responses(self, gray, dtype=np.float64):
+        """
+        Args:
+            gray: (H, W) float
+            dtype: float64 (parité skimage) ou float32 (~2x plus rapide,
+                   écart ~1e-7, utilisé pour les grandes images)
+
+        Returns:
+            (n_filtres, H, W) dtype : réponses réelles
+        """
+        H, W = gray.shape
+        p = self.pad
+        padded = np.pad(gray.astype(dtype), p, mode="symmetric")
+        shape = (sfft.next_fast_len(padded.shape[0], real=True),
+                 sfft.next_fast_len(padded.shape[1], real=True))
+
+        spec = sfft.rfft2(padded, s=shape)
+        out = sfft.irfft2(spec[None] * self._kernel_spectra(shape, dtype), s=shape, axes=(-2, -1))
+        return out[:, p:p + H, p:p + W]
+
+    def stats(self, gray):
+        """
+        [moyenne, variance] par filtre, dans l'ordre (fréquence, orientation)
+        """
+        r = self.responses(gray)
+        return np.stack([r.mean(axis=(1, 2)), r.var(axis=(1, 2))], axis=1).ravel()
+
+
+@lru_cache(maxsize=None)
+def get_gabor_bank(freqs, thetas):
+    """
+    Banc partagé par processus (clé : tuples de fréquences / orientations)
+    """
+    return GaborBank(freqs, thetas)
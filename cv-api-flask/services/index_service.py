@@ -84,6 +84,12 @@ class FaissIndexService:
         if self.indices[class_id].d != dim:
             raise ValueError(f"FAISS dim mismatch for class {class_id}: {self.indices[class_id].d} != {dim}")
 
+    def dim_for(self, class_id: int):
+        """Dimension attendue pour class_id (index de la classe, sinon globale ; None si inconnue)."""
+        with self._lock:
+            index = self.indices.get(class_id)
+            return index.d if index is not None else self.dim
+
     def add_batch(self, class_id: int, vectors: np.ndarray, metadata_list: list[dict], persist: bool = True):
         """
         Ajoute N vecteurs (N,D) en une fois (plus rapide).
@@ -0,0 +1,120 @@
+# services/job_queue.py
+import time
+import uuid
+import queue
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class JobQueue:
+    """
+    File de jobs locale (sans broker externe) pour les traitements longs.
+    - profondeur bornée : submit lève queue.Full si la file est pleine
+    - workers threads dédiés : les requêtes de recherche ne passent pas derrière
+    - calcul optionnel dans un pool de processus (in_process=True) pour ne
+      pas disputer le GIL aux threads Flask ; then(result) s'exécute ensuite
+      dans le thread worker (ex. insertion dans l'index en mémoire)
+    - statut : queued / running / done / failed + timings
+    """
+
+    def __init__(self, workers=2, max_depth=32, processes=0, history=1000):
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.history = history
+
+        # spawn : le pool démarre depuis un thread worker du processus Flask
+        # (FAISS / OpenMP chargés), un fork hériterait de verrous tenus
+        self._pool = ProcessPoolExecutor(
+            max_workers=processes, mp_context=mp.get_context("spawn")
+        ) if processes > 0 else None
+
+        for i in range(workers):
+            threading.Thread(
+                target=self._worker,
+                name=f"job-worker-{i}",
+                daemon=True
+            ).start()
+
+    def submit(self, kind, fn, args=(), then=None, cleanup=None, in_process=False):
+        """
+        Returns:
+            job_id (str)
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        task = (job_id, fn, args, then, cleanup, in_process and self._pool is not None)
+
+        with self._lock:
+            self._jobs[job_id] = job
+            try:
+                self._queue.put_nowait(task)
+            except queue.Full:
+                del self._jobs[job_id]
+                raise
+            self._trim_locked()
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+
+        now = time.time()
+        started, finished = job["started_at"], job["finished_at"]
+        job["queue_wait_s"] = round((started or now) - job["created_at"], 3)
+        job["run_s"] = round((finished or now) - started, 3) if started else None
+        return job
+
+    def depth(self):
+        return self._queue.qsize()
+
+    # --------------------------------------------------
+    def _set(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _trim_locked(self):
+        # oublie les plus anciens jobs terminés au-delà de history
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _worker(self):
+        while True:
+            job_id, fn, args, then, cleanup, in_process = self._queue.get()
+            self._set(job_id, status="running", started_at=time.time())
+            try:
+                if in_process:
+                    result = self._pool.submit(fn, *args).result()
+                else:
+                    result = fn(*args)
+                if then is not None:
+                    result = then(result)
+                self._set(job_id, status="done", result=result, finished_at=time.time())
+            except Exception as e:
+                self._set(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                if cleanup is not None:
+                    try:
+                        cleanup()
+                    except Exception:
+                        pass
+                self._queue.task_done()
@@ -0,0 +1,70 @@
+# services/shape3d_descriptor_cache.py
+import os
+import json
+import hashlib
+import numpy as np
+
+
+def bytes_sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def content_seed(content_hash: str) -> int:
+    """
+    Graine dérivée du hash du contenu : même fichier -> même échantillonnage
+    """
+    return int(content_hash[:8], 16)
+
+
+def file_sha1(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash du contenu d'un fichier (lecture par blocs)
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Shape3DDescriptorCache:
+    """
+    Cache disque des descripteurs 3D par modèle.
+    Clé = hash du contenu du fichier + hash des paramètres du descripteur :
+    un fichier modifié ou un changement de paramètres invalide l'entrée.
+    Une entrée = un .npz (local_desc, global_desc), écrit de façon atomique.
+    """
+
+    def __init__(self, cache_dir: str, params: dict):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        blob = json.dumps(params, sort_keys=True).encode("utf-8")
+        self.params_key = hashlib.sha1(blob).hexdigest()[:12]
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(
+            self.cache_dir,
+            f"{content_hash}_{self.params_key}.npz"
+        )
+
+    def get(self, content_hash: str):
+        """
+        Returns:
+            (local_desc, global_desc) ou None si absent / illisible
+        """
+        path = self._path(content_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return data["local_desc"], data["global_desc"]
+        except Exception:
+            return None
+
+    def put(self, content_hash: str, local_desc: np.ndarray, global_desc: np.ndarray):
+        path = self._path(content_hash)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, local_desc=local_desc, global_desc=global_desc)
+        os.replace(tmp, path)
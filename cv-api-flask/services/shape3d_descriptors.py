@@ -0,0 +1,109 @@
+# services/shape3d_descriptors.py
+
+import numpy as np
+
+
+class GlobalDescriptor3D:
+    """
+    Interface des descripteurs GLOBAUX 3D (un vecteur par modèle)
+    Entrée : nuage normalisé (Shape3DNormalizer : centré, sphère unité, PCA)
+    """
+
+    name = None
+    dim = None
+
+    def compute(self, points: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def _normalized_hist(values, bins, value_range):
+        hist, _ = np.histogram(values, bins=bins, range=value_range)
+        hist = hist.astype(np.float32)
+        s = float(hist.sum())
+        if s > 0:
+            hist /= s
+        return hist
+
+
+class D2Descriptor(GlobalDescriptor3D):
+    """
+    D2 shape distribution (Osada et al.) :
+    histogramme des distances entre paires de points aléatoires
+    """
+
+    name = "d2"
+
+    def __init__(self, bins=64, n_pairs=20000, seed=0):
+        self.bins = bins
+        self.dim = bins
+        self.n_pairs = n_pairs
+        self.seed = seed
+
+    def compute(self, points):
+        rng = np.random.default_rng(self.seed)
+        i = rng.integers(0, len(points), self.n_pairs)
+        j = rng.integers(0, len(points), self.n_pairs)
+        d = np.linalg.norm(points[i] - points[j], axis=1)
+        # nuage dans la sphère unité : distances dans [0, 2]
+        return self._normalized_hist(d, self.bins, (0.0, 2.0))
+
+
+class A3Descriptor(GlobalDescriptor3D):
+    """
+    A3 : histogramme des angles formés par des triplets de points aléatoires
+    """
+
+    name = "a3"
+
+    def __init__(self, bins=36, n_triples=20000, seed=0):
+        self.bins = bins
+        self.dim = bins
+        self.n_triples = n_triples
+        self.seed = seed
+
+    def compute(self, points):
+        rng = np.random.default_rng(self.seed)
+        a, b, c = (points[rng.integers(0, len(points), self.n_triples)] for _ in range(3))
+        u = a - b
+        v = c - b
+        nu = np.linalg.norm(u, axis=1)
+        nv = np.linalg.norm(v, axis=1)
+        valid = (nu > 1e-9) & (nv > 1e-9)
+        cos = np.sum(u[valid] * v[valid], axis=1) / (nu[valid] * nv[valid])
+        ang = np.arccos(np.clip(cos, -1, 1))
+        return self._normalized_hist(ang, self.bins, (0.0, np.pi))
+
+
+class VoxelDescriptor(GlobalDescriptor3D):
+    """
+    Grille d'occupation (grid^3) du nuage aligné PCA, dans le cube [-1, 1]^3
+    """
+
+    name = "voxel"
+
+    def __init__(self, grid=8):
+        self.grid = grid
+        self.dim = grid ** 3
+
+    def compute(self, points):
+        idx = np.floor((points + 1.0) * 0.5 * self.grid).astype(np.int64)
+        idx = np.clip(idx, 0, self.grid - 1)
+        flat = (idx[:, 0] * self.grid + idx[:, 1]) * self.grid + idx[:, 2]
+        occ = np.bincount(flat, minlength=self.dim).astype(np.float32)
+        return occ / max(1.0, float(len(points)))
+
+
+# "shape_context" : descripteur local (ShapeContext3D) agrégé, cf. describe_points
+GLOBAL_ENGINES = {
+    D2Descriptor.name: D2Descriptor,
+    A3Descriptor.name: A3Descriptor,
+    VoxelDescriptor.name: VoxelDescriptor,
+}
+
+ENGINES = ("shape_context",) + tuple(GLOBAL_ENGINES)
+
+
+def get_global_engine(name):
+    if name not in GLOBAL_ENGINES:
+        raise ValueError(f"Moteur de descripteur 3D inconnu : {name} (choix : {', '.join(ENGINES)})")
+    return GLOBAL_ENGINES[name]()
@@ -1,41 +1,287 @@
 # services/shape3d_index_service.py
 import os
-import pickle
+import json
+import time
+import atexit
+import threading
+import multiprocessing as mp
 import numpy as np
 import faiss
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from services.shape_context_3d import ShapeContext3D
+from services.shape_context_3d import ShapeContext3D, select_keypoints
 from services.shape3d_loader import Shape3DLoader
 from services.shape3d_normalizer import Shape3DNormalizer
-from services.shape3d_matching import aggregate_descriptor
+from services.shape3d_matching import aggregate_descriptor, shape_context_distances
+from services.shape3d_descriptor_cache import (
+    Shape3DDescriptorCache, file_sha1, bytes_sha1, content_seed
+)
+from services.shape3d_store import LocalDescriptorStore, atomic_write
+from services.shape3d_descriptors import get_global_engine
+from services.shape3d_partitions import LabelPartitions
+from utils.rwlock import RWLock
+
+
+DEFAULT_PARAMS = {
+    "engine": "shape_context",   # ou moteur global : "d2" | "a3" | "voxel"
+    "sample_points": 2048,
+    "n_keypoints": 50,
+    "keypoints": "random",   # "random" | "fps" (farthest point sampling)
+    "radius": None,          # None : tout le nuage ; sinon voisinage KD-tree
+}
+
+
+def shape3d_params(cfg):
+    """
+    Paramètres de descripteurs depuis la Config (app Flask et test.py)
+    """
+    return {
+        "sample_points": cfg.SHAPE3D_SAMPLE_POINTS,
+        "keypoints": cfg.SHAPE3D_KEYPOINTS,
+        "radius": cfg.SHAPE3D_RADIUS,
+    }
+
+
+def engine_index_dir(root, engine):
+    """
+    Dossier de l'index d'un moteur : shape_context à la racine (index
+    existants inchangés), moteurs globaux sous <root>/<engine>
+    """
+    return root if engine == "shape_context" else os.path.join(root, engine)
+
+
+def descriptor_params(params=None):
+    """
+    Paramètres qui déterminent les descripteurs (clé du cache disque)
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    # valide aussi radius (> r_min)
+    sc = ShapeContext3D(radius=params["radius"])
+    return {
+        "pipeline_version": 3,   # v2 : lecteur OBJ natif ; v3 : tirages seedés par le hash
+        **params,
+        "radial_bins": sc.radial_bins,
+        "theta_bins": sc.theta_bins,
+        "phi_bins": sc.phi_bins,
+        "r_min": sc.r_min,
+        "r_max": sc.r_max,
+    }
+
+
+def describe_points(pts, params=None, seed=None):
+    """
+    Descripteurs d'un nuage de points déjà normalisé
+
+    Returns:
+        (local_desc (K, D), global_desc (D,) float32)
+        Moteurs globaux (d2, a3, voxel) : local_desc vide (0, 0)
+
+    seed : graine du tirage des points clés (None : aléatoire)
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+
+    if params["engine"] != "shape_context":
+        global_desc = get_global_engine(params["engine"]).compute(pts).astype("float32")
+        return np.zeros((0, 0), dtype=np.float32), global_desc
+
+    # Local descriptors
+    rng = np.random.default_rng(seed) if seed is not None else None
+    ref_indices = select_keypoints(pts, params["n_keypoints"], params["keypoints"], rng)
+    local_desc = ShapeContext3D(radius=params["radius"]).compute_batch(pts, ref_indices)
+
+    # Global descriptor
+    global_desc = aggregate_descriptor(local_desc).astype("float32")
+
+    return local_desc, global_desc
+
+
+def compute_descriptors(obj_path, params=None, cache_dir=None, content_hash=None):
+    """
+    Pipeline 3D complet pour un modèle (load -> normalize -> descripteurs)
+    """
+    return compute_multi(obj_path, [params or {}], cache_dir, content_hash)[0]
+
+
+def compute_multi(obj_path, params_list, cache_dir=None, content_hash=None):
+    """
+    Descripteurs d'un modèle pour plusieurs moteurs : le fichier n'est
+    chargé / normalisé qu'une fois par nombre de points échantillonnés.
+    Échantillonnage et points clés sont tirés avec une graine dérivée du
+    hash du contenu : un même fichier donne toujours les mêmes descripteurs.
+
+    Returns:
+        liste de (local_desc, global_desc), dans l'ordre de params_list
+    """
+    seed = content_seed(content_hash or file_sha1(obj_path))
+    return _describe_all(
+        lambda n: Shape3DLoader.load_obj(obj_path, sample_points=n, cache_dir=cache_dir, seed=seed),
+        params_list,
+        seed
+    )
+
+
+def compute_multi_bytes(data, filename, params_list, cache_dir=None, content_hash=None):
+    """
+    Comme compute_multi, depuis un upload en mémoire (OBJ, PLY, GLB, STL,
+    OFF, éventuellement .gz) : pas de fichier temporaire.
+    """
+    content_hash = content_hash or bytes_sha1(data)
+    seed = content_seed(content_hash)
+    return _describe_all(
+        lambda n: Shape3DLoader.load_bytes(
+            data, filename, sample_points=n, seed=seed,
+            cache_dir=cache_dir, content_hash=content_hash
+        ),
+        params_list,
+        seed
+    )
+
+
+def _describe_all(load_points, params_list, seed):
+    clouds = {}
+    out = []
+    for params in params_list:
+        params = {**DEFAULT_PARAMS, **params}
+        n = params["sample_points"]
+        if n not in clouds:
+            clouds[n] = Shape3DNormalizer.normalize(load_points(n))
+        out.append(describe_points(clouds[n], params, seed))
+    return out
+
+
+def _compute_worker(path, params_list):
+    """
+    Point d'entrée des processus du pool (erreurs renvoyées, pas levées)
+    """
+    try:
+        return path, compute_multi(path, params_list), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def iter_descriptors(paths, params_list, workers=None):
+    """
+    Calcule les descripteurs de plusieurs modèles sur un pool de processus.
+    Rend (path, [(local_desc, global_desc), ...], error) dans l'ordre de complétion.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield _compute_worker(path, params_list)
+        return
+
+    # spawn : appelé depuis un thread de JobQueue (Flask, FAISS / OpenMP
+    # déjà initialisés), un fork copierait des verrous tenus par d'autres threads
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=ctx) as pool:
+        futures = [pool.submit(_compute_worker, p, params_list) for p in paths]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+
+def index_many(services, items, workers=None):
+    """
+    Ajout en masse dans un ou plusieurs index (un par moteur) :
+    extraction parallèle (un chargement par fichier), un seul index.add
+    FAISS et une seule persistance par index.
+
+    Args:
+        items: liste de (obj_path, filename, label)
+
+    Returns:
+        liste (ordre de items) de {"filename", "label", "success", "id"|"error"}
+        (id dans le premier index de services)
+    """
+    by_path = {path: (fname, label) for path, fname, label in items}
+    results = {}
+    ok_rows = []   # (path, [(local_desc, global_desc) par service])
+
+    for path, descs, error in iter_descriptors(
+        list(by_path), [svc.params for svc in services], workers
+    ):
+        fname, label = by_path[path]
+        if error is not None:
+            results[path] = {"filename": fname, "label": label,
+                             "success": False, "error": error}
+        else:
+            ok_rows.append((path, descs))
+
+    # ordre d'entrée conservé pour les ids
+    order = {path: i for i, (path, _, _) in enumerate(items)}
+    ok_rows.sort(key=lambda r: order[r[0]])
+
+    if ok_rows:
+        rows_meta = [by_path[path] for path, _ in ok_rows]
+        for k, svc in enumerate(services):
+            ids = svc.add_batch(rows_meta, [descs[k] for _, descs in ok_rows])
+            if k == 0:
+                for (path, _), (fname, label), model_id in zip(ok_rows, rows_meta, ids):
+                    results[path] = {"filename": fname, "label": label,
+                                     "success": True, "id": model_id}
+
+    return [results[path] for path, _, _ in items]
 
 
 class Shape3DIndexService:
     """
     FAISS Index for 3D CBIR
+
+    Instance longue durée partagée entre requêtes :
+    - index FAISS en mémoire, filename/label en colonnes, descripteurs
+      locaux en memmap (verrou lecteurs/écrivain)
+    - rechargement si les fichiers ont été modifiés par un autre processus
+      (comparaison des mtime)
+    - ajouts persistés en arrière-plan (regroupés sur persist_delay secondes)
     """
 
-    def __init__(self, index_dir="data/faiss/shape3d"):
+    def __init__(self, index_dir="data/faiss/shape3d", preload=False, persist_delay=1.0,
+                 params=None, local_dtype="float32"):
         self.index_dir = index_dir
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
         os.makedirs(index_dir, exist_ok=True)
 
         self.index_path = os.path.join(index_dir, "shape3d.index")
-        self.meta_path = os.path.join(index_dir, "metadata.pkl")
+        self.cache_dir = os.path.join(index_dir, "cache")
+
+        # paramètres des descripteurs, écrits dans le sidecar : un index
+        # construit avec d'autres paramètres est refusé au chargement
+        # (forme JSON pour comparer avec le sidecar relu)
+        self.descriptor_params = json.loads(json.dumps(descriptor_params(self.params)))
 
         self.index = None
-        self.metadata = []
+        # sous-index par label (recherches filtrées), construits à la demande
+        self.partitions = LabelPartitions()
+        # filename / label / descripteurs locaux (memmap + sidecar)
+        self.store = LocalDescriptorStore(index_dir, dtype=local_dtype, params=self.descriptor_params)
+        self.meta_path = self.store.meta_path
+
+        self._lock = RWLock()
+        self._stamp = None        # mtimes des fichiers chargés / écrits
+        self._dirty = False       # ajouts en mémoire non encore persistés
+        self._writing = False
+        self._persist_lock = threading.Lock()
+
+        self.persist_delay = persist_delay
+        self._persist_event = threading.Event()
+        self._persist_thread = None
+
+        if preload:
+            self.refresh()
 
     # --------------------------------------------------
-    def build_index(self, models_dir, labels_csv):
+    def build_index(self, models_dir, labels_csv, workers=None, use_cache=True):
+        """
+        Indexation complète d'un dossier de modèles.
+        - extraction répartie sur un pool de processus (workers, défaut: nb CPU)
+        - descripteurs mis en cache par modèle au fil de l'eau : une
+          reconstruction (ou une reprise après crash) ne recalcule que
+          les fichiers nouveaux ou modifiés
+        """
         import pandas as pd
 
         labels_df = pd.read_csv(labels_csv)
         label_map = dict(zip(labels_df["filename"], labels_df["label"]))
 
-        sc = ShapeContext3D()
-        descriptors = []
-        self.metadata = []
-
         files = sorted([
             f for f in os.listdir(models_dir)
             if f.lower().endswith(".obj")
@@ -43,132 +289,351 @@ class Shape3DIndexService:
 
         print(f"[INFO] Indexation de {len(files)} modèles 3D")
 
-        for idx, fname in enumerate(files):
-            path = os.path.join(models_dir, fname)
-
-            # 1. Load
-            pts = Shape3DLoader.load_obj(path)
-
-            # 2. Normalize
-            pts = Shape3DNormalizer.normalize(pts)
+        cache = Shape3DDescriptorCache(self.cache_dir, descriptor_params(self.params)) if use_cache else None
 
-            # 3. Local descriptors
-            num_keypoints = min(50, pts.shape[0])
-            ref_indices = np.random.choice(
-                pts.shape[0],
-                num_keypoints,
-                replace=False
-            )
+        descs = {}    # fname -> (local_desc, global_desc)
+        hashes = {}   # path -> hash contenu
+        todo = []
+        for fname in files:
+            path = os.path.join(models_dir, fname)
+            if cache is not None:
+                h = file_sha1(path)
+                hashes[path] = h
+                hit = cache.get(h)
+                if hit is not None:
+                    descs[fname] = hit
+                    continue
+            todo.append(path)
+
+        print(f"[INFO] Cache: {len(descs)} modèles réutilisés, {len(todo)} à calculer")
+
+        failed = []
+        t0 = time.perf_counter()
+
+        def on_result(done, path, local_desc, global_desc, error):
+            fname = os.path.basename(path)
+            if error is not None:
+                failed.append(fname)
+                print(f"[WARN] {fname}: {error}")
+            else:
+                descs[fname] = (local_desc, global_desc)
+                if cache is not None:
+                    cache.put(hashes[path], local_desc, global_desc)
+
+            if done % 25 == 0 or done == len(todo):
+                elapsed = time.perf_counter() - t0
+                rate = done / elapsed if elapsed > 0 else 0.0
+                print(f"[INFO] {done}/{len(todo)} modèles calculés ({rate:.1f} modèles/s)")
+
+        for done, (path, computed, error) in enumerate(
+            iter_descriptors(todo, [self.params], workers), 1
+        ):
+            local_desc, global_desc = computed[0] if computed else (None, None)
+            on_result(done, path, local_desc, global_desc, error)
+
+        kept = [f for f in files if f in descs]
+
+        X = np.vstack([descs[f][1].astype("float32") for f in kept])
+        dim = X.shape[1]
 
-            local_desc = np.array([
-                sc.compute(pts, ref_idx)
-                for ref_idx in ref_indices
-            ])
+        index = faiss.IndexFlatL2(dim)
+        index.add(X)
+
+        with self._lock.write_locked():
+            self._writing = True
+            try:
+                self.store.write_all(
+                    kept,
+                    [label_map.get(f, "Unknown") for f in kept],
+                    [descs[f][0] for f in kept]
+                )
+                atomic_write(self.index_path, faiss.serialize_index(index).tobytes())
+                self.index = index
+                self.partitions = LabelPartitions()
+                self._dirty = False
+                self._stamp = self._disk_stamp()
+            finally:
+                self._writing = False
+
+        if failed:
+            print(f"[WARN] {len(failed)} modèles ignorés (échec de chargement)")
+        print(f"[OK] Index FAISS 3D créé ({len(kept)} modèles, "
+              f"{time.perf_counter() - t0:.1f}s)")
 
-            # 4. Global descriptor
-            global_desc = aggregate_descriptor(local_desc)
+    # --------------------------------------------------
+    def describe(self, obj_path, cache_dir=None, content_hash=None):
+        """
+        Descripteurs (local, global) d'un modèle avec les paramètres de l'index
+        """
+        return compute_descriptors(obj_path, self.params, cache_dir, content_hash)
 
-            descriptors.append(global_desc.astype("float32"))
+    def describe_bytes(self, data, filename, cache_dir=None, content_hash=None):
+        """
+        Idem describe, depuis un upload en mémoire
+        """
+        return compute_multi_bytes(data, filename, [self.params], cache_dir, content_hash)[0]
 
-            self.metadata.append({
-                "id": idx,
-                "filename": fname,
-                "label": label_map.get(fname, "Unknown"),
-                "local_desc": local_desc
-            })
+    # --------------------------------------------------
+    def _disk_stamp(self):
+        try:
+            return (
+                os.stat(self.index_path).st_mtime_ns,
+                os.stat(self.store.meta_path).st_mtime_ns
+            )
+        except FileNotFoundError:
+            # index construit avant le store memmap : conversion au chargement
+            if os.path.exists(self.index_path) and os.path.exists(self.store.legacy_path):
+                return (os.stat(self.index_path).st_mtime_ns, None)
+            return None
 
-        X = np.vstack(descriptors)
-        dim = X.shape[1]
+    def load(self):
+        with self._lock.write_locked():
+            self._load_locked()
+
+    def _load_locked(self):
+        stamp = self._disk_stamp()
+        index = faiss.read_index(self.index_path)
+        store = LocalDescriptorStore(self.index_dir, dtype=self.store.default_dtype,
+                                     params=self.descriptor_params)
+        store.load()
+
+        # sidecar antérieur : paramètres inconnus, accepté tel quel
+        if store.disk_params is not None and store.disk_params != self.descriptor_params:
+            changed = sorted(
+                k for k in set(store.disk_params) | set(self.descriptor_params)
+                if store.disk_params.get(k) != self.descriptor_params.get(k)
+            )
+            raise RuntimeError(
+                f"Index 3D {self.index_dir} construit avec d'autres paramètres "
+                f"({', '.join(changed)}) : reconstruire l'index (test.py)"
+            )
 
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(X)
+        # écriture concurrente en cours (index et sidecar désalignés) :
+        # on garde l'état actuel, rechargement au prochain appel
+        if index.ntotal != len(store):
+            if self.index is None:
+                raise RuntimeError("Index 3D et metadata désalignés")
+            return
 
-        faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, "wb") as f:
-            pickle.dump(self.metadata, f)
+        self.index = index
+        self.store = store
+        self.partitions = LabelPartitions()
+        self._stamp = stamp
 
-        print("[OK] Index FAISS 3D créé")
+    def refresh(self):
+        """
+        Recharge depuis le disque si les fichiers ont changé
+        (autre processus, ex. test.py) et qu'aucun ajout local n'est en attente.
+        """
+        if self._dirty or self._writing:
+            return
+        stamp = self._disk_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        with self._lock.write_locked():
+            if not self._dirty and not self._writing and self._disk_stamp() != self._stamp:
+                self._load_locked()
+
+    def size(self):
+        self.refresh()
+        with self._lock.read_locked():
+            return 0 if self.index is None else int(self.index.ntotal)
 
     # --------------------------------------------------
-    def load(self):
-        self.index = faiss.read_index(self.index_path)
-        with open(self.meta_path, "rb") as f:
-            self.metadata = pickle.load(f)
+    def flush(self):
+        """
+        Persiste immédiatement les ajouts en attente
+        """
+        with self._persist_lock:
+            with self._lock.read_locked():
+                if not self._dirty:
+                    return
+                index_bytes = faiss.serialize_index(self.index)
+                snap = self.store.snapshot()
+                self._writing = True
+                self._dirty = False
+            try:
+                self.store.persist(snap)
+                atomic_write(self.index_path, index_bytes.tobytes())
+                self._stamp = self._disk_stamp()
+            finally:
+                self._writing = False
+
+    def _schedule_persist(self):
+        self._dirty = True
+        self._persist_event.set()
+        if self._persist_thread is None or not self._persist_thread.is_alive():
+            self._persist_thread = threading.Thread(
+                target=self._persist_loop,
+                name="shape3d-persist",
+                daemon=True
+            )
+            self._persist_thread.start()
+            atexit.register(self.flush)
+
+    def _persist_loop(self):
+        while True:
+            self._persist_event.wait()
+            time.sleep(self.persist_delay)  # regroupe les ajouts rapprochés
+            self._persist_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._dirty = True
+                print(f"[WARN] Persistance index 3D échouée: {e}")
 
     # --------------------------------------------------
-    def search(self, query_desc, top_k=10):
-        if self.index is None:
-            self.load()
+    def search(self, query_desc, top_k=10, query_local=None, rerank_k=0,
+               labels=None, exclude_labels=None):
+        """
+        Recherche FAISS sur le descripteur global.
+        Mode rerank (query_local + rerank_k > 0) : les rerank_k meilleurs
+        candidats FAISS sont re-classés par matching chi2 des descripteurs locaux.
+        Filtres labels / exclude_labels : seuls les sous-index des labels
+        retenus sont parcourus.
+        """
+        self.refresh()
+        with self._lock.read_locked():
+            if self.index is None:
+                return []
+            return self._search_locked(
+                query_desc, top_k, query_local, rerank_k, labels, exclude_labels
+            )
 
+    def _search_locked(self, query_desc, top_k, query_local, rerank_k,
+                       labels=None, exclude_labels=None):
+        # pas de rerank pour les moteurs globaux (pas de descripteurs locaux)
+        rerank = query_local is not None and query_local.size > 0 and rerank_k > 0
+        n = max(top_k, rerank_k) if rerank else top_k
         q = query_desc.astype("float32").reshape(1, -1)
-        distances, indices = self.index.search(q, top_k)
+
+        if labels or exclude_labels:
+            self.partitions.ensure(self.index, self.store.labels)
+            selected = self.partitions.select(labels, exclude_labels)
+            n = min(n, self.partitions.size(selected))
+            if n <= 0:
+                return []
+            distances, indices = self.partitions.search(q, n, selected)
+        else:
+            n = min(n, self.index.ntotal)
+            if n <= 0:
+                return []
+            distances, indices = self.index.search(q, n)
+            distances, indices = distances[0], indices[0]
 
         results = []
-        for i, d in zip(indices[0], distances[0]):
-            meta = self.metadata[i]
+        for i, d in zip(indices, distances):
+            if i == -1:
+                continue
             results.append({
-                "filename": meta["filename"],
-                "label": meta["label"],
+                "filename": self.store.filenames[i],
+                "label": self.store.labels[i],
                 "distance": float(d)
             })
 
-        return results
-    def add_one(self, obj_path, label="Unknown"):
-        """
-        Ajoute dynamiquement un modèle 3D à l'index FAISS
-        """
+        if rerank:
+            # seuls les rerank_k premiers candidats FAISS sont re-classés,
+            # la suite garde l'ordre FAISS
+            valid = [i for i in indices if i != -1][:rerank_k]
+            local_d = self._local_distances(query_local, valid)
+            for r, ld in zip(results, local_d):
+                # inf -> None : "Infinity" n'est pas du JSON valide
+                r["local_distance"] = float(ld) if np.isfinite(ld) else None
+            # candidats sans descripteur local en dernier (ordre FAISS)
+            results[:len(valid)] = sorted(
+                results[:len(valid)],
+                key=lambda r: (r["local_distance"] is None, r["local_distance"] or 0.0)
+            )
 
-        # Charger ou créer l'index
-        if os.path.exists(self.index_path):
-            self.load()
-        else:
-            self.index = None
-            self.metadata = []
+        return results[:top_k]
 
-        # Pipeline 3D
-        pts = Shape3DLoader.load_obj(obj_path)
-        pts = Shape3DNormalizer.normalize(pts)
+    def _local_distances(self, query_local, ids):
+        """
+        Distances chi2 locales pour une liste d'ids
+        (inf si local_desc absent ou de forme différente)
+        Seules les lignes des candidats sont lues dans le memmap.
+        """
+        out = np.full(len(ids), np.inf, dtype=np.float32)
 
-        sc = ShapeContext3D()
+        pos, descs = [], []
+        for p, i in enumerate(ids):
+            d = self.store.local(i)
+            if d.shape == query_local.shape:
+                pos.append(p)
+                descs.append(d)
 
-        num_keypoints = min(50, pts.shape[0])
-        ref_indices = np.random.choice(
-            pts.shape[0],
-            num_keypoints,
-            replace=False
-        )
+        if descs:
+            out[pos] = shape_context_distances(query_local, np.stack(descs))
+        return out
 
-        local_desc = np.array([
-            sc.compute(pts, idx)
-            for idx in ref_indices
-        ])
+    def add_one(self, obj_path, label="Unknown", filename=None):
+        """
+        Ajoute dynamiquement un modèle 3D à l'index FAISS
+        (en mémoire, persistance en arrière-plan)
+        """
+        filename = filename or os.path.basename(obj_path)
 
-        global_desc = aggregate_descriptor(local_desc).astype("float32")
+        # Pipeline 3D (hors verrou)
+        local_desc, global_desc = self.describe(obj_path)
 
-        # Création index si vide
-        if self.index is None:
-            dim = global_desc.shape[0]
-            self.index = faiss.IndexFlatL2(dim)
+        return self.add_descriptors(filename, label, local_desc, global_desc)
 
-        # Ajout FAISS
-        self.index.add(global_desc.reshape(1, -1))
+    def add_descriptors(self, filename, label, local_desc, global_desc):
+        """
+        Insère des descripteurs déjà calculés (ex. dans un processus worker)
+        """
+        self.refresh()
+        with self._lock.write_locked():
+            # Création index si vide
+            if self.index is None:
+                dim = global_desc.shape[0]
+                self.index = faiss.IndexFlatL2(dim)
 
-        model_id = len(self.metadata)
+            # Ajout FAISS
+            self.index.add(global_desc.reshape(1, -1))
 
-        self.metadata.append({
-            "id": model_id,
-            "filename": os.path.basename(obj_path),
-            "label": label,
-        })
+            model_id = self.store.append(filename, label, local_desc)
+            self.partitions.add([model_id], global_desc.reshape(1, -1), [label])
 
-        # Sauvegarde
-        faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, "wb") as f:
-            pickle.dump(self.metadata, f)
+            self._schedule_persist()
 
         return {
             "id": model_id,
-            "filename": os.path.basename(obj_path),
+            "filename": filename,
             "label": label
         }
 
+    def add_many(self, items, workers=None):
+        """
+        Ajout en masse dans cet index (cf. index_many)
+        """
+        return index_many([self], items, workers)
+
+    def add_batch(self, rows_meta, descs):
+        """
+        Insère N modèles déjà décrits : un seul index.add FAISS, une persistance
+
+        Args:
+            rows_meta: liste de (filename, label)
+            descs: liste de (local_desc, global_desc)
+
+        Returns:
+            liste des ids
+        """
+        X = np.vstack([g.reshape(1, -1) for _, g in descs]).astype("float32")
+
+        self.refresh()
+        with self._lock.write_locked():
+            if self.index is None:
+                self.index = faiss.IndexFlatL2(X.shape[1])
+            self.index.add(X)
+
+            ids = [
+                self.store.append(fname, label, local_desc)
+                for (fname, label), (local_desc, _) in zip(rows_meta, descs)
+            ]
+            self.partitions.add(ids, X, [label for _, label in rows_meta])
+            self._dirty = True
+
+        self.flush()
+        return ids
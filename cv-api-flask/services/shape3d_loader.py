@@ -1,24 +1,320 @@
 # services/shape3d_loader.py
 
+import io
 import os
+import re
+import gzip
+import mmap
 import trimesh
 import numpy as np
 
+from services.shape3d_descriptor_cache import file_sha1, bytes_sha1
+
+
+_V_RE = re.compile(rb"^[ \t]*v[ \t]+([^\r\n]*)", re.M)
+_F_RE = re.compile(rb"^[ \t]*f[ \t]+([^\r\n]*)", re.M)
+_SLASH_RE = re.compile(rb"/[^\s]*")
+
+MMAP_THRESHOLD = 16 * 1024 * 1024   # au-delà : fichier lu via mmap
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# formats acceptés en upload (+ variantes .gz)
+MESH_FORMATS = ("obj", "ply", "glb", "stl", "off")
+MAX_DECOMPRESSED = 512 * 1024 * 1024   # garde-fou contre les archives gzip piégées
+
+
+def _iter_chunks(buf, chunk_size=CHUNK_SIZE):
+    """
+    Découpe un buffer (bytes ou mmap) en blocs terminés par une fin de ligne
+    """
+    n = len(buf)
+    start = 0
+    while start < n:
+        end = min(start + chunk_size, n)
+        if end < n:
+            nl = buf.find(b"\n", end)
+            end = n if nl == -1 else nl + 1
+        yield buf[start:end]
+        start = end
+
+
+def _parse_vertices(lines):
+    flat = np.fromstring(b" ".join(lines), dtype=np.float64, sep=" ")
+    if flat.size == 3 * len(lines):
+        return flat.reshape(-1, 3)
+    # composantes w / couleurs : on garde x, y, z
+    return np.array([l.split()[:3] for l in lines], dtype=np.float64)
+
+
+def _parse_faces(lines):
+    text = b"\n".join(lines)
+
+    # cas courant : uniquement des triangles, même format "v/vt/vn" partout
+    # -> un seul parse C, puis on garde la 1re composante de chaque sommet
+    first = lines[0].split()[0]
+    k = len([c for c in first.split(b"/") if c])
+    n_refs = 3 * len(lines)
+    if len(text.split()) == n_refs and text.count(b"/") == n_refs * first.count(b"/"):
+        flat = np.fromstring(text.replace(b"/", b" "), dtype=np.int64, sep=" ")
+        if flat.size == n_refs * k:
+            return flat.reshape(-1, k)[:, 0].reshape(-1, 3)
+
+    # "f v/vt/vn ..." -> "f v ..."
+    lines = _SLASH_RE.sub(b"", text).split(b"\n")
+    counts = np.array([len(l.split()) for l in lines], dtype=np.int64)
+    flat = np.fromstring(b" ".join(lines), dtype=np.int64, sep=" ")
+
+    if counts.min() < 3 or flat.size != counts.sum():
+        raise ValueError("Faces OBJ non gérées")
+
+    if np.all(counts == 3):
+        return flat.reshape(-1, 3)
+
+    # polygones : triangulation en éventail, par groupe de même taille
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    tris = []
+    for c in np.unique(counts):
+        rows = flat[offsets[counts == c][:, None] + np.arange(c)]
+        for i in range(1, c - 1):
+            tris.append(rows[:, [0, i, i + 1]])
+    return np.vstack(tris)
+
+
+def parse_obj(path: str):
+    """
+    Lecture OBJ native (lignes v / f uniquement) vers NumPy.
+    Lève ValueError pour les fichiers non gérés (indices négatifs,
+    pas de faces...) : l'appelant repasse alors par trimesh.
+
+    Returns:
+        (vertices (V,3) float64, faces (F,3) int64, indices 0-based)
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError("Fichier OBJ vide")
+
+        if size > MMAP_THRESHOLD:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+
+        try:
+            return parse_obj_buffer(buf)
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+def parse_obj_buffer(buf):
+    """
+    Comme parse_obj, depuis un buffer en mémoire (bytes ou mmap)
+    """
+    if len(buf) == 0:
+        raise ValueError("Fichier OBJ vide")
+
+    v_lines, f_lines = [], []
+    for chunk in _iter_chunks(buf):
+        v_lines.extend(_V_RE.findall(chunk))
+        f_lines.extend(_F_RE.findall(chunk))
+
+    if not v_lines or not f_lines:
+        raise ValueError("Aucune face / aucun sommet")
+
+    vertices = _parse_vertices(v_lines)
+    faces = _parse_faces(f_lines) - 1
+
+    if faces.min() < 0 or faces.max() >= len(vertices):
+        raise ValueError("Indices de faces hors bornes ou relatifs")
+
+    return vertices, faces
+
+
+def mesh_format(filename: str):
+    """
+    (format, gzip ?) d'après l'extension : "a.obj.gz" -> ("obj", True)
+    """
+    name = filename.lower()
+    gz = name.endswith(".gz")
+    if gz:
+        name = name[:-3]
+    ext = os.path.splitext(name)[1].lstrip(".")
+    if ext not in MESH_FORMATS:
+        raise ValueError(
+            f"Format 3D non supporté : {filename} "
+            f"({', '.join(MESH_FORMATS)}, éventuellement .gz)"
+        )
+    return ext, gz
+
+
+def gunzip(data: bytes, limit: int = MAX_DECOMPRESSED) -> bytes:
+    try:
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+            out = f.read(limit + 1)
+    except (OSError, EOFError) as e:
+        raise ValueError(f"Fichier gzip invalide : {e}")
+    if len(out) > limit:
+        raise ValueError("Fichier décompressé trop volumineux")
+    return out
+
+
+def sample_surface(vertices, faces, count, rng=None):
+    """
+    Échantillonnage uniforme de surface pondéré par l'aire (vectorisé)
+    rng : np.random.Generator (tirage reproductible), sinon np.random
+    """
+    rng = rng if rng is not None else np.random
+    tri = vertices[faces]                  # (F,3,3)
+    a = tri[:, 0]
+    ab = tri[:, 1] - a
+    ac = tri[:, 2] - a
+
+    areas = np.linalg.norm(np.cross(ab, ac), axis=1)
+    cum = np.cumsum(areas)
+    if cum[-1] <= 0:
+        raise ValueError("Surface d'aire nulle")
+
+    face_idx = np.searchsorted(cum, rng.random(count) * cum[-1])
+    face_idx = np.minimum(face_idx, len(faces) - 1)
+
+    # coordonnées barycentriques uniformes (repli du parallélogramme)
+    uv = rng.random((count, 2))
+    flip = uv.sum(axis=1) > 1
+    uv[flip] = 1 - uv[flip]
+
+    return (
+        a[face_idx]
+        + uv[:, :1] * ab[face_idx]
+        + uv[:, 1:] * ac[face_idx]
+    )
+
 
 class Shape3DLoader:
     """
     Chargement robuste de modèles 3D (.obj)
     Sortie : nuage de points (N, 3)
+
+    Le centrage / mise à l'échelle est fait une seule fois par Shape3DNormalizer.
     """
 
     @staticmethod
-    def load_obj(path: str, sample_points: int = 2048) -> np.ndarray:
+    def load_obj(path: str, sample_points: int = 2048, cache_dir: str = None,
+                 seed: int = None) -> np.ndarray:
+        """
+        seed : graine de l'échantillonnage (None : aléatoire)
+        """
 
         if not os.path.isfile(path):
             raise FileNotFoundError(f"Fichier OBJ introuvable : {path}")
 
-        # Load mesh or scene
-        mesh_or_scene = trimesh.load(path, process=False)
+        # Cache .npz des points échantillonnés (clé = hash du fichier)
+        cache_path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_path = os.path.join(
+                cache_dir,
+                f"{file_sha1(path)}_{sample_points}.npz"
+            )
+            if os.path.exists(cache_path):
+                try:
+                    with np.load(cache_path) as data:
+                        return data["points"]
+                except Exception:
+                    pass
+
+        try:
+            vertices, faces = parse_obj(path)
+        except ValueError:
+            # fichiers inhabituels : chemin trimesh
+            vertices, faces = Shape3DLoader._load_trimesh(path)
+
+        # même tirage que load_bytes : un fichier indexé et le même
+        # fichier envoyé en requête donnent le même nuage pour une graine
+        rng = np.random.default_rng(seed) if seed is not None else None
+        points = sample_surface(vertices, faces, sample_points, rng).astype(np.float32)
+
+        if cache_path is not None:
+            tmp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, points=points)
+            os.replace(tmp, cache_path)
+
+        return points
+
+    @staticmethod
+    def load_bytes(data: bytes, filename: str, sample_points: int = 2048,
+                   seed: int = None, cache_dir: str = None,
+                   content_hash: str = None) -> np.ndarray:
+        """
+        Nuage de points depuis un upload en mémoire (sans fichier temporaire).
+        Formats : OBJ texte, PLY (binaire / ascii), GLB, STL, OFF, et leurs .gz
+        """
+        cache_path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_path = os.path.join(
+                cache_dir,
+                f"{content_hash or bytes_sha1(data)}_{sample_points}.npz"
+            )
+            if os.path.exists(cache_path):
+                try:
+                    with np.load(cache_path) as npz:
+                        return npz["points"]
+                except Exception:
+                    pass
+
+        vertices, faces = Shape3DLoader.mesh_from_bytes(data, filename)
+        rng = np.random.default_rng(seed) if seed is not None else None
+        points = sample_surface(vertices, faces, sample_points, rng).astype(np.float32)
+
+        if cache_path is not None:
+            tmp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, points=points)
+            os.replace(tmp, cache_path)
+
+        return points
+
+    @staticmethod
+    def mesh_from_bytes(data: bytes, filename: str):
+        """
+        Returns:
+            (vertices (V,3), faces (F,3)) ; lève ValueError si illisible
+        """
+        fmt, gz = mesh_format(filename)
+        if gz:
+            data = gunzip(data)
+
+        if fmt == "obj":
+            try:
+                return parse_obj_buffer(data)
+            except ValueError:
+                pass   # OBJ inhabituel : trimesh
+
+        try:
+            mesh_or_scene = trimesh.load(io.BytesIO(data), file_type=fmt, process=False)
+        except Exception as e:
+            raise ValueError(f"Lecture {fmt.upper()} échouée : {e}")
+
+        mesh = Shape3DLoader._as_mesh(mesh_or_scene, filename)
+        return np.asarray(mesh.vertices, dtype=np.float64), np.asarray(mesh.faces, dtype=np.int64)
+
+    @staticmethod
+    def _load_trimesh(path: str):
+        """
+        Returns:
+            (vertices (V,3), faces (F,3)) ; lève ValueError si illisible
+        """
+        try:
+            mesh_or_scene = trimesh.load(path, process=False)
+        except Exception as e:
+            raise ValueError(f"Lecture échouée pour {path}: {e}")
+
+        mesh = Shape3DLoader._as_mesh(mesh_or_scene, path)
+        return np.asarray(mesh.vertices, dtype=np.float64), np.asarray(mesh.faces, dtype=np.int64)
+
+    @staticmethod
+    def _as_mesh(mesh_or_scene, path: str):
 
         # Scene → concatenate meshes
         if isinstance(mesh_or_scene, trimesh.Scene):
@@ -32,6 +328,9 @@ class Shape3DLoader:
         else:
             mesh = mesh_or_scene
 
+        if not isinstance(mesh, trimesh.Trimesh):
+            raise ValueError(f"Pas de surface (nuage de points ?) : {path}")
+
         if mesh.is_empty or mesh.vertices.shape[0] == 0:
             raise ValueError(f"Mesh vide ou invalide : {path}")
 
@@ -40,16 +339,7 @@ class Shape3DLoader:
         mesh.merge_vertices()          # replaces duplicate vertices
         mesh.process(validate=True)    # handles degeneracies internally
 
-        # Normalisation (important for CBIR)
-        mesh.vertices -= mesh.centroid
-        scale = np.linalg.norm(mesh.vertices, axis=1).max()
-        if scale > 0:
-            mesh.vertices /= scale
-
-        # Sample surface points
-        try:
-            points = mesh.sample(sample_points)
-        except Exception as e:
-            raise RuntimeError(f"Échantillonnage échoué pour {path}: {e}")
+        if len(mesh.faces) == 0:
+            raise ValueError(f"Mesh sans faces : {path}")
 
-        return points.astype(np.float32)
+        return mesh
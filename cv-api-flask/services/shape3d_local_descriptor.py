@@ -2,6 +2,8 @@
 
 import numpy as np
 
+from services.shape_context_3d import bin_histograms
+
 
 class ShapeContext3DLocal:
     """
@@ -13,12 +15,14 @@ class ShapeContext3DLocal:
         n_keypoints=150,
         r_bins=5,
         theta_bins=12,
-        phi_bins=6
+        phi_bins=6,
+        chunk_size=32
     ):
         self.n_keypoints = n_keypoints
         self.r_bins = r_bins
         self.theta_bins = theta_bins
         self.phi_bins = phi_bins
+        self.chunk_size = chunk_size
 
     def compute(self, points: np.ndarray) -> np.ndarray:
         """
@@ -34,33 +38,55 @@ class ShapeContext3DLocal:
         idx = np.random.choice(N, min(self.n_keypoints, N), replace=False)
         keypoints = points[idx]
 
+        shape = (self.r_bins, self.theta_bins, self.phi_bins)
+        theta_edges = np.linspace(-np.pi, np.pi, self.theta_bins + 1)
+        phi_edges = np.linspace(0, np.pi, self.phi_bins + 1)
+
         local_descs = []
 
-        for p in keypoints:
-            rel = points - p
+        for start in range(0, len(keypoints), self.chunk_size):
+            kp = keypoints[start:start + self.chunk_size]
+            rel = points[None, :, :] - kp[:, None, :]      # (k, N, 3)
 
-            r = np.linalg.norm(rel, axis=1) + 1e-6
-            theta = np.arctan2(rel[:, 1], rel[:, 0])
-            phi = np.arccos(rel[:, 2] / r)
+            r = np.linalg.norm(rel, axis=2) + 1e-6
+            theta = np.arctan2(rel[..., 1], rel[..., 0])
+            phi = np.arccos(rel[..., 2] / r)
 
             r_log = np.log(r)
 
-            hist, _ = np.histogramdd(
-                np.vstack([r_log, theta, phi]).T,
-                bins=[self.r_bins, self.theta_bins, self.phi_bins],
-                range=[
-                    [r_log.min(), r_log.max()],
-                    [-np.pi, np.pi],
-                    [0, np.pi]
-                ]
-            )
+            # bornes radiales propres à chaque point clé (comme histogramdd)
+            r_edges = np.stack([
+                np.linspace(*self._outer_edges(lo, hi), self.r_bins + 1)
+                for lo, hi in zip(r_log.min(axis=1), r_log.max(axis=1))
+            ])
 
-            hist = hist.flatten().astype(np.float32)
+            rb = self._digitize(r_log, r_edges)
+            tb = self._digitize(theta, theta_edges)
+            pb = self._digitize(phi, phi_edges)
 
-            s = hist.sum()
-            if s > 0:
-                hist /= s
+            hist = bin_histograms(rb, tb, pb, np.ones_like(r, dtype=bool), shape)
+
+            s = hist.sum(axis=1, keepdims=True)
+            hist = np.divide(hist, s, out=hist, where=s > 0)
 
             local_descs.append(hist)
 
         return np.vstack(local_descs)  # (K, D)
+
+    @staticmethod
+    def _outer_edges(lo, hi):
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        return lo, hi
+
+    @staticmethod
+    def _digitize(values, edges):
+        """
+        Indice de bin façon histogramdd : intervalles [e_i, e_i+1),
+        dernier bin fermé à droite, hors bornes -> -1 ou n.
+        """
+        if edges.ndim == 1:
+            edges = np.broadcast_to(edges, (values.shape[0], edges.shape[0]))
+        idx = (values[..., None] >= edges[:, None, :]).sum(axis=-1)
+        idx[values == edges[:, -1:]] -= 1
+        return idx - 1
@@ -8,20 +8,44 @@ def chi2_distance(h1, h2):
     )
 
 
+def chi2_distance_matrix(descA, descB):
+    """
+    Matrice chi2 complète (KA, KB) en une seule opération broadcast
+    """
+    a = np.asarray(descA)[:, None, :]
+    b = np.asarray(descB)[None, :, :]
+    return 0.5 * np.sum(((a - b) ** 2) / (a + b + 1e-8), axis=-1)
+
+
 def shape_context_distance(descA, descB):
     """
     Local features matching
     """
-    distances = []
+    d = chi2_distance_matrix(descA, descB)
+    return float(np.mean(d.min(axis=1)))
 
-    for i in range(len(descA)):
-        dmin = np.inf
-        for j in range(len(descB)):
-            d = chi2_distance(descA[i], descB[j])
-            dmin = min(dmin, d)
-        distances.append(dmin)
 
-    return float(np.mean(distances))
+def shape_context_distances(query_desc, candidates, chunk_size=8):
+    """
+    Local features matching d'une requête contre M candidats
+
+    Args:
+        query_desc (np.ndarray): (K, D)
+        candidates (np.ndarray): (M, K2, D)
+        chunk_size (int): candidats par bloc (borne mémoire M x K x K2 x D)
+
+    Returns:
+        np.ndarray: (M,) distances
+    """
+    q = np.asarray(query_desc, dtype=np.float32)[None, :, None, :]
+    candidates = np.asarray(candidates, dtype=np.float32)
+
+    out = np.empty(len(candidates), dtype=np.float32)
+    for start in range(0, len(candidates), chunk_size):
+        c = candidates[start:start + chunk_size][:, None, :, :]
+        d = 0.5 * np.sum(((q - c) ** 2) / (q + c + 1e-8), axis=-1)  # (m, K, K2)
+        out[start:start + chunk_size] = d.min(axis=2).mean(axis=1)
+    return out
 
 
 def aggregate_descriptor(local_desc):
@@ -0,0 +1,94 @@
+# services/shape3d_partitions.py
+import threading
+import numpy as np
+import faiss
+
+
+class LabelPartitions:
+    """
+    Sous-index FAISS par label (catégorie de vase) pour les recherches
+    filtrées : une requête restreinte à quelques labels ne parcourt que
+    les partitions correspondantes au lieu de tout le catalogue.
+
+    Construit à la demande (première recherche filtrée) à partir de
+    l'index principal, puis tenu à jour par add().
+    """
+
+    def __init__(self):
+        self._parts = None        # label -> (IndexFlatL2, ids globaux int64)
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._parts is not None
+
+    def ensure(self, index, labels):
+        """
+        Construit les partitions si besoin (appelé sous verrou lecteur)
+        """
+        if self._parts is not None:
+            return
+        with self._lock:
+            if self._parts is not None:
+                return
+            X = index.reconstruct_n(0, index.ntotal)
+            labels = np.asarray(labels, dtype=object)
+            parts = {}
+            for label in dict.fromkeys(labels.tolist()):
+                ids = np.flatnonzero(labels == label).astype(np.int64)
+                sub = faiss.IndexFlatL2(index.d)
+                sub.add(X[ids])
+                parts[label] = (sub, ids)
+            self._parts = parts
+
+    def add(self, ids, X, labels):
+        """
+        Ajout de vecteurs (appelé sous verrou écrivain) ; sans effet
+        tant que les partitions n'ont pas été construites
+        """
+        if self._parts is None:
+            return
+        for label in dict.fromkeys(labels):
+            rows = [k for k, l in enumerate(labels) if l == label]
+            sub, old_ids = self._parts.get(label, (None, np.empty(0, dtype=np.int64)))
+            if sub is None:
+                sub = faiss.IndexFlatL2(X.shape[1])
+            sub.add(X[rows])
+            self._parts[label] = (sub, np.concatenate([old_ids, np.asarray(ids)[rows]]))
+
+    def select(self, include=None, exclude=None):
+        """
+        Labels retenus : include (tous si vide) moins exclude
+        """
+        labels = [l for l in include if l in self._parts] if include else list(self._parts)
+        if exclude:
+            labels = [l for l in labels if l not in set(exclude)]
+        return labels
+
+    def size(self, labels):
+        return sum(self._parts[l][0].ntotal for l in labels)
+
+    def search(self, q, n, labels):
+        """
+        k-NN restreint aux partitions de labels
+
+        Returns:
+            (distances (n,), ids globaux (n,)) triés par distance
+        """
+        dists, ids = [], []
+        for label in labels:
+            sub, sub_ids = self._parts[label]
+            k = min(n, sub.ntotal)
+            if k <= 0:
+                continue
+            D, I = sub.search(q, k)
+            dists.append(D[0])
+            ids.append(sub_ids[I[0]])
+
+        if not dists:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        dists = np.concatenate(dists)
+        ids = np.concatenate(ids)
+        order = np.argsort(dists, kind="stable")[:n]
+        return dists[order], ids[order]
@@ -0,0 +1,95 @@
+# services/shape3d_query_cache.py
+import json
+import threading
+from collections import OrderedDict
+
+from services.shape3d_descriptor_cache import Shape3DDescriptorCache
+
+
+class QueryDescriptorCache:
+    """
+    Cache des descripteurs de requête /search-3d.
+    Clé = (hash du contenu uploadé, paramètres du descripteur) :
+    - LRU borné en mémoire (capacity entrées)
+    - persistance disque optionnelle (persist_dir, un .npz par entrée via
+      Shape3DDescriptorCache), relue au redémarrage
+    Les tirages étant seedés par le hash, une entrée est exactement ce
+    que le pipeline recalculerait.
+    """
+
+    def __init__(self, capacity=256, persist_dir=None):
+        self.capacity = capacity
+        self.persist_dir = persist_dir or None
+        self._entries = OrderedDict()
+        self._disk = {}           # params_key -> Shape3DDescriptorCache
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _params_key(params):
+        return json.dumps(params, sort_keys=True)
+
+    def _disk_cache(self, params_key, params):
+        cache = self._disk.get(params_key)
+        if cache is None:
+            cache = Shape3DDescriptorCache(self.persist_dir, params)
+            self._disk[params_key] = cache
+        return cache
+
+    def get(self, content_hash, params):
+        """
+        Args:
+            params: paramètres du descripteur (cf. descriptor_params)
+
+        Returns:
+            (local_desc, global_desc) ou None
+        """
+        params_key = self._params_key(params)
+        key = (content_hash, params_key)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hit
+
+        if self.persist_dir:
+            hit = self._disk_cache(params_key, params).get(content_hash)
+            if hit is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._insert_locked(key, hit)
+                return hit
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, content_hash, params, local_desc, global_desc):
+        params_key = self._params_key(params)
+        with self._lock:
+            self._insert_locked((content_hash, params_key), (local_desc, global_desc))
+        if self.persist_dir:
+            self._disk_cache(params_key, params).put(content_hash, local_desc, global_desc)
+
+    def _insert_locked(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "persistent": bool(self.persist_dir),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
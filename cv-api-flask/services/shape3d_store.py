@@ -0,0 +1,243 @@
+# services/shape3d_store.py
+import os
+import glob
+import json
+import time
+import pickle
+import numpy as np
+
+
+class LocalDescriptorStore:
+    """
+    Stockage compact des descripteurs locaux 3D (remplace metadata.pkl)
+    - local_desc.bin : une seule matrice contiguë (lignes, D) float32/float16,
+      ouverte en np.memmap ; le modèle i occupe les lignes
+      [offset[i], offset[i] + count[i])
+    - metadata.json : sidecar colonnaire (filename, label, offset, count)
+      + paramètres des descripteurs (params) qui ont produit l'index
+
+    Le fichier binaire est en ajout seul : le sidecar (écrit de façon
+    atomique) fait foi, les lignes au-delà de son total sont ignorées.
+    Les modèles ajoutés en mémoire restent dans _pending jusqu'à persist().
+
+    Un fichier déjà mappé (ce processus ou un autre) n'est jamais tronqué
+    ni remplacé (impossible sous Windows) : réécriture complète ou lignes
+    orphelines -> nouvelle génération local_desc.<n>.bin, désignée par
+    le sidecar ("data_file"). La génération précédente est conservée
+    pour les lecteurs en cours, les plus anciennes supprimées si possible.
+    """
+
+    def __init__(self, index_dir, dtype="float32", params=None):
+        self.index_dir = index_dir
+        self.params = params
+        self.disk_params = None   # params lus dans le sidecar (None : ancien sidecar)
+        self.data_path = os.path.join(index_dir, "local_desc.bin")
+        self.meta_path = os.path.join(index_dir, "metadata.json")
+        self.legacy_path = os.path.join(index_dir, "metadata.pkl")
+        self.default_dtype = np.dtype(dtype)
+        self.dtype = self.default_dtype
+        self.clear()
+
+    def clear(self):
+        self.filenames = []
+        self.labels = []
+        self.offsets = []
+        self.counts = []
+        self.dim = None
+        self.disk_models = 0     # modèles dont les lignes sont sur disque
+        self._pending = {}       # id -> local_desc pas encore persisté
+        self._mm = None
+
+    def __len__(self):
+        return len(self.filenames)
+
+    # --------------------------------------------------
+    def local(self, i):
+        """
+        (K, D) float32 ; seules les lignes du modèle i sont lues
+        """
+        pending = self._pending.get(i)
+        if pending is not None:
+            return pending
+        start = self.offsets[i]
+        end = start + self.counts[i]
+        if end == start:
+            # dim inconnue tant qu'aucun modèle n'a de ligne
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._mapped(end)[start:end], dtype=np.float32)
+
+    def _mapped(self, rows):
+        mm = self._mm
+        if mm is None or mm.shape[0] < rows:
+            n_rows = self.offsets[self.disk_models - 1] + self.counts[self.disk_models - 1]
+            mm = np.memmap(self.data_path, dtype=self.dtype, mode="r",
+                           shape=(n_rows, self.dim))
+            self._mm = mm
+        return mm
+
+    def append(self, filename, label, local_desc):
+        local_desc = np.asarray(local_desc, dtype=np.float32)
+        # un modèle sans ligne ne fixe pas la dimension
+        if len(local_desc):
+            if self.dim is None:
+                self.dim = int(local_desc.shape[1])
+            elif local_desc.shape[1] != self.dim:
+                raise ValueError(f"Dimension locale {local_desc.shape[1]} != {self.dim}")
+
+        i = len(self.filenames)
+        self.offsets.append(self.offsets[-1] + self.counts[-1] if i else 0)
+        self.counts.append(int(local_desc.shape[0]))
+        self.filenames.append(filename)
+        self.labels.append(label)
+        self._pending[i] = local_desc
+        return i
+
+    # --------------------------------------------------
+    def _sidecar(self, n):
+        return {
+            "dtype": self.dtype.name,
+            "dim": self.dim,
+            "filename": self.filenames[:n],
+            "label": self.labels[:n],
+            "offset": self.offsets[:n],
+            "count": self.counts[:n],
+            "params": self.params,
+        }
+
+    def _write_sidecar(self, side, data_path):
+        side = {**side, "data_file": os.path.basename(data_path)}
+        atomic_write(self.meta_path, json.dumps(side).encode("utf-8"))
+
+    def _new_data_path(self):
+        return os.path.join(self.index_dir, f"local_desc.{time.time_ns()}.bin")
+
+    def _switch(self, data_path):
+        """
+        Bascule sur une nouvelle génération (sidecar déjà écrit)
+        """
+        previous = self.data_path
+        self.data_path = data_path
+        self._mm = None
+        for path in glob.glob(os.path.join(self.index_dir, "local_desc*.bin")):
+            if os.path.normpath(path) in (os.path.normpath(data_path), os.path.normpath(previous)):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass   # encore mappé (Windows) : supprimé à la prochaine génération
+
+    def snapshot(self):
+        """
+        État à persister (à prendre sous verrou lecteur)
+        """
+        n = len(self)
+        rows = [self._pending[i] for i in range(self.disk_models, n)]
+        return n, self.disk_models, rows, self._sidecar(n)
+
+    def persist(self, snap):
+        """
+        Écrit un snapshot : ajout des lignes puis sidecar atomique
+        """
+        n, disk_models, rows, side = snap
+
+        data_path = self.data_path
+        if rows:
+            disk_rows = self.offsets[disk_models - 1] + self.counts[disk_models - 1] if disk_models else 0
+            size = os.path.getsize(data_path) if os.path.exists(data_path) else -1
+            data = np.concatenate(rows).astype(self.dtype).tobytes()
+
+            if disk_models > 0 and size == disk_rows * (self.dim or 0) * self.dtype.itemsize:
+                # cas courant : ajout en fin de fichier, sans troncature
+                with open(data_path, "ab") as f:
+                    f.write(data)
+            else:
+                # premier écrit ou lignes orphelines (écriture interrompue) :
+                # lignes valides + nouvelles dans une nouvelle génération
+                data_path = self._new_data_path()
+                with open(data_path, "wb") as f:
+                    if disk_rows:
+                        f.write(np.ascontiguousarray(self._mapped(disk_rows)[:disk_rows]).tobytes())
+                    f.write(data)
+
+        self._write_sidecar(side, data_path)
+        if data_path != self.data_path:
+            self._switch(data_path)
+
+        self.disk_models = n
+        for i in range(disk_models, n):
+            self._pending.pop(i, None)
+
+    # --------------------------------------------------
+    def load(self):
+        """
+        Lit le sidecar et ouvre la matrice en memmap.
+        Un ancien metadata.pkl est converti au passage.
+        """
+        if not os.path.exists(self.meta_path) and os.path.exists(self.legacy_path):
+            self._convert_legacy()
+
+        with open(self.meta_path, "rb") as f:
+            side = json.load(f)
+
+        self.clear()
+        self.dtype = np.dtype(side["dtype"])
+        # 0 : sidecar écrit sans aucune ligne (conversion d'un ancien index)
+        self.dim = side["dim"] or None
+        self.filenames = side["filename"]
+        self.labels = side["label"]
+        self.offsets = side["offset"]
+        self.counts = side["count"]
+        self.disk_params = side.get("params")
+        self.disk_models = len(self.filenames)
+        # sidecar antérieur aux générations : local_desc.bin
+        self.data_path = os.path.join(self.index_dir, side.get("data_file", "local_desc.bin"))
+
+        # mappé tout de suite : la génération lue reste ouverte même si
+        # un autre processus en écrit une nouvelle entre-temps
+        if self.disk_models and self.offsets[-1] + self.counts[-1]:
+            self._mapped(self.offsets[-1] + self.counts[-1])
+
+    def write_all(self, filenames, labels, local_descs):
+        """
+        Réécriture complète (build_index) via fichiers temporaires
+        """
+        self.clear()
+        self.dtype = self.default_dtype
+        for fname, label, d in zip(filenames, labels, local_descs):
+            self.append(fname, label, d)
+
+        # nouvelle génération plutôt qu'un os.replace sur un fichier mappé
+        data_path = self._new_data_path()
+        with open(data_path, "wb") as f:
+            for i in range(len(self)):
+                f.write(self._pending[i].astype(self.dtype).tobytes())
+
+        self._write_sidecar(self._sidecar(len(self)), data_path)
+        self._switch(data_path)
+        self.disk_models = len(self)
+        self._pending = {}
+
+    def _convert_legacy(self):
+        with open(self.legacy_path, "rb") as f:
+            metadata = pickle.load(f)
+
+        # anciens ajouts dynamiques sans local_desc : 0 ligne (sans
+        # dimension si aucun modèle n'en a : fixée au premier ajout réel)
+        dims = [m["local_desc"].shape[1] for m in metadata if m.get("local_desc") is not None]
+        dim = dims[0] if dims else 0
+        self.write_all(
+            [m["filename"] for m in metadata],
+            [m["label"] for m in metadata],
+            [
+                m["local_desc"] if m.get("local_desc") is not None
+                else np.zeros((0, dim), dtype=np.float32)
+                for m in metadata
+            ]
+        )
+
+
+def atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -1,4 +1,67 @@
 import numpy as np
+from scipy.spatial import cKDTree
+
+
+def _bincount_rows(rows, flat, n_rows, D):
+    counts = np.bincount(rows * D + flat, minlength=n_rows * D)
+    return counts.reshape(n_rows, D).astype(np.float32)
+
+
+def bin_histograms(r_idx, t_idx, p_idx, valid, shape):
+    """
+    Moteur d'histogrammes batché (K points de référence d'un coup)
+
+    Args:
+        r_idx, t_idx, p_idx (np.ndarray): (K, N) indices de bins par axe
+        valid (np.ndarray): (K, N) masque des points à compter
+        shape (tuple): (n_r, n_theta, n_phi)
+
+    Returns:
+        np.ndarray: (K, n_r * n_theta * n_phi) comptes float32
+    """
+    n_r, n_t, n_p = shape
+    K = r_idx.shape[0]
+    D = n_r * n_t * n_p
+
+    valid = valid & \
+        (r_idx >= 0) & (r_idx < n_r) & \
+        (t_idx >= 0) & (t_idx < n_t) & \
+        (p_idx >= 0) & (p_idx < n_p)
+
+    # index plat (k, r, t, p) -> un seul bincount pour tout le bloc
+    flat = (r_idx * n_t + t_idx) * n_p + p_idx
+    rows = np.broadcast_to(np.arange(K)[:, None], flat.shape)
+
+    return _bincount_rows(rows[valid], flat[valid], K, D)
+
+
+def farthest_point_indices(points, k):
+    """
+    Sélection de k points clés par échantillonnage du point le plus éloigné
+    (couverture uniforme de la surface, déterministe)
+    """
+    n = len(points)
+    k = min(k, n)
+    idx = np.empty(k, dtype=np.int64)
+
+    # départ : point le plus éloigné du centroïde
+    idx[0] = int(np.argmax(np.linalg.norm(points - points.mean(axis=0), axis=1)))
+    d = np.linalg.norm(points - points[idx[0]], axis=1)
+    for i in range(1, k):
+        idx[i] = int(np.argmax(d))
+        d = np.minimum(d, np.linalg.norm(points - points[idx[i]], axis=1))
+    return idx
+
+
+def select_keypoints(points, k, method="random", rng=None):
+    """
+    method: "random" (tirage uniforme) ou "fps" (farthest point sampling)
+    rng: np.random.Generator pour un tirage reproductible (sinon np.random)
+    """
+    if method == "fps":
+        return farthest_point_indices(points, k)
+    rng = rng if rng is not None else np.random
+    return rng.choice(len(points), min(k, len(points)), replace=False)
 
 
 class ShapeContext3D:
@@ -13,57 +76,121 @@ class ShapeContext3D:
         theta_bins=6,
         phi_bins=6,
         r_min=0.01,
-        r_max=2.0
+        r_max=2.0,
+        chunk_size=32,
+        radius=None
     ):
         self.radial_bins = radial_bins
         self.theta_bins = theta_bins
         self.phi_bins = phi_bins
         self.r_min = r_min
         self.r_max = r_max
+        # nb de points de référence traités ensemble (borne mémoire K x N)
+        self.chunk_size = chunk_size
+        # mode voisinage : seuls les points à distance <= radius sont comptés
+        # (KD-tree, coût par point clé ~ taille du voisinage au lieu de N)
+        if radius and radius <= r_min:
+            # bornes log [r_min, radius] inversées : histogrammes vides
+            raise ValueError(f"radius ({radius}) doit être > r_min ({r_min})")
+        self.radius = radius
+
+    @property
+    def dim(self):
+        return self.radial_bins * self.theta_bins * self.phi_bins
+
+    def _edges(self):
+        r_bins = np.logspace(
+            np.log10(self.r_min),
+            np.log10(self.radius or self.r_max),
+            self.radial_bins + 1
+        )
+        theta_bins = np.linspace(0, np.pi, self.theta_bins + 1)
+        phi_bins = np.linspace(0, 2 * np.pi, self.phi_bins + 1)
+        return r_bins, theta_bins, phi_bins
 
     def compute(self, points, ref_idx):
         """
         Calcule le Shape Context 3D pour un point de référence
         """
-        ref = points[ref_idx]
-        diff = points - ref
-        dist = np.linalg.norm(diff, axis=1)
+        return self.compute_batch(points, [ref_idx])[0]
+
+    def compute_batch(self, points, ref_indices):
+        """
+        Calcule les Shape Contexts 3D de tous les points de référence
 
-        mask = dist > 1e-6
-        diff = diff[mask]
-        dist = dist[mask]
+        Args:
+            points (np.ndarray): (N,3)
+            ref_indices: K indices de points de référence
 
-        # Coordonnées sphériques
-        r = dist
-        theta = np.arccos(np.clip(diff[:, 2] / r, -1, 1))
-        phi = np.mod(np.arctan2(diff[:, 1], diff[:, 0]), 2 * np.pi)
+        Returns:
+            np.ndarray: (K, D) descripteurs locaux (float32)
+        """
+        ref_indices = np.asarray(ref_indices, dtype=np.int64)
+        if self.radius:
+            return self._compute_neighborhood(points, ref_indices)
 
-        # Bins
-        r_bins = np.logspace(
-            np.log10(self.r_min),
-            np.log10(self.r_max),
-            self.radial_bins + 1
-        )
-        theta_bins = np.linspace(0, np.pi, self.theta_bins + 1)
-        phi_bins = np.linspace(0, 2 * np.pi, self.phi_bins + 1)
+        r_bins, theta_bins, phi_bins = self._edges()
+        shape = (self.radial_bins, self.theta_bins, self.phi_bins)
 
-        hist = np.zeros(
-            (self.radial_bins, self.theta_bins, self.phi_bins),
-            dtype=np.float32
-        )
+        out = np.zeros((len(ref_indices), self.dim), dtype=np.float32)
+
+        for start in range(0, len(ref_indices), self.chunk_size):
+            refs = points[ref_indices[start:start + self.chunk_size]]
+
+            diff = points[None, :, :] - refs[:, None, :]   # (k, N, 3)
+            r = np.linalg.norm(diff, axis=2)               # (k, N)
+            valid = r > 1e-6
+
+            # Coordonnées sphériques (points confondus ignorés via valid)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                theta = np.arccos(np.clip(diff[..., 2] / r, -1, 1))
+            phi = np.mod(np.arctan2(diff[..., 1], diff[..., 0]), 2 * np.pi)
 
-        for i in range(len(r)):
-            rb = np.searchsorted(r_bins, r[i]) - 1
-            tb = np.searchsorted(theta_bins, theta[i]) - 1
-            pb = np.searchsorted(phi_bins, phi[i]) - 1
+            # searchsorted(side="left") - 1 : même convention que le binning point à point
+            rb = np.searchsorted(r_bins, r) - 1
+            tb = np.searchsorted(theta_bins, theta) - 1
+            pb = np.searchsorted(phi_bins, phi) - 1
 
-            if 0 <= rb < self.radial_bins and \
-               0 <= tb < self.theta_bins and \
-               0 <= pb < self.phi_bins:
-                hist[rb, tb, pb] += 1
+            hist = bin_histograms(rb, tb, pb, valid, shape)
+            hist /= (hist.sum(axis=1, keepdims=True) + 1e-8)
+            out[start:start + len(refs)] = hist
 
-        hist = hist.flatten()
-        hist /= (hist.sum() + 1e-8)
+        return out
+
+    def _compute_neighborhood(self, points, ref_indices):
+        """
+        Variante voisinage : un KD-tree par modèle, binning des seuls
+        couples (point clé, voisin) à distance <= radius
+        """
+        r_bins, theta_bins, phi_bins = self._edges()
+        K = len(ref_indices)
+
+        tree = cKDTree(points)
+        neighbors = tree.query_ball_point(points[ref_indices], r=self.radius)
+
+        rows = np.repeat(np.arange(K), [len(nb) for nb in neighbors])
+        cols = np.concatenate([np.asarray(nb, dtype=np.int64) for nb in neighbors]) \
+            if K else np.empty(0, dtype=np.int64)
+
+        diff = points[cols] - points[ref_indices][rows]
+        r = np.linalg.norm(diff, axis=1)
+        valid = r > 1e-6
+        rows, diff, r = rows[valid], diff[valid], r[valid]
+
+        theta = np.arccos(np.clip(diff[:, 2] / r, -1, 1))
+        phi = np.mod(np.arctan2(diff[:, 1], diff[:, 0]), 2 * np.pi)
+
+        rb = np.searchsorted(r_bins, r) - 1
+        tb = np.searchsorted(theta_bins, theta) - 1
+        pb = np.searchsorted(phi_bins, phi) - 1
+
+        inside = (rb >= 0) & (rb < self.radial_bins) & \
+                 (tb >= 0) & (tb < self.theta_bins) & \
+                 (pb >= 0) & (pb < self.phi_bins)
+        flat = (rb * self.theta_bins + tb) * self.phi_bins + pb
+
+        hist = _bincount_rows(rows[inside], flat[inside], K, self.dim)
+        hist /= (hist.sum(axis=1, keepdims=True) + 1e-8)
         return hist
 
 
@@ -77,8 +204,4 @@ def compute_shape_contexts(points, n_samples=50):
     n = min(len(points), n_samples)
     indices = np.random.choice(len(points), n, replace=False)
 
-    descriptors = []
-    for idx in indices:
-        descriptors.append(sc.compute(points, idx))
-
-    return np.array(descriptors, dtype=np.float32)
+    return sc.compute_batch(points, indices)
@@ -0,0 +1,126 @@
+# services/warmup.py
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from services.feature_service import FeatureService
+
+
+class Warmup:
+    """
+    Préchauffage au démarrage (optionnel, cf. Config.WARMUP) :
+    étapes nommées exécutées dans l'ordre, en arrière-plan ou bloquant.
+    Le worker n'est "prêt" qu'une fois toutes les étapes terminées sans
+    erreur ; status() donne l'avancement et les temps par étape
+    (exposé par /health/ready).
+    """
+
+    def __init__(self):
+        self._steps = OrderedDict()   # nom -> fonction
+        self._status = OrderedDict()  # nom -> {status, duration_ms, error}
+        self._lock = threading.Lock()
+        self.state = "pending"        # pending | running | ready | failed
+        self.started_at = None
+        self.finished_at = None
+
+    def add(self, name, fn):
+        self._steps[name] = fn
+        self._status[name] = {"status": "pending", "duration_ms": None, "error": None}
+
+    def start(self, background=True):
+        if background:
+            threading.Thread(target=self.run, name="warmup", daemon=True).start()
+        else:
+            self.run()
+
+    def run(self):
+        with self._lock:
+            self.state = "running"
+            self.started_at = time.time()
+
+        failed = False
+        for name, fn in self._steps.items():
+            self._set(name, status="running")
+            t = time.perf_counter()
+            try:
+                fn()
+                self._set(name, status="done")
+            except Exception as e:
+                failed = True
+                self._set(name, status="failed", error=str(e))
+            finally:
+                self._set(name, duration_ms=round((time.perf_counter() - t) * 1000.0, 1))
+
+        with self._lock:
+            self.state = "failed" if failed else "ready"
+            self.finished_at = time.time()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def status(self):
+        with self._lock:
+            steps = {name: dict(s) for name, s in self._status.items()}
+            end = self.finished_at or time.time()
+            return {
+                "state": self.state,
+                "progress": f"{sum(s['status'] == 'done' for s in steps.values())}/{len(steps)}",
+                "elapsed_s": round(end - self.started_at, 3) if self.started_at else None,
+                "steps": steps,
+            }
+
+
+# ----------------- étapes -----------------
+
+def warm_yolo(yolo, imgsz, conf, iou, runs=3, batcher=None):
+    """
+    Chargement des poids + inférences factices à imgsz (graphe, allocations).
+    Avec le micro-batching, un batch plein passe aussi par le batcher
+    (qui sérialise l'accès au modèle avec le trafic réel).
+    """
+    yolo.load()
+    dummy = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    for _ in range(runs):
+        if batcher is not None:
+            # sans timeout : la 1re inférence (compilation du graphe) peut être longue
+            batcher.submit(dummy, conf, iou, imgsz).result()
+        else:
+            yolo.predict(dummy, conf, iou, imgsz)
+    if batcher is not None and batcher.max_batch > 1:
+        futures = [batcher.submit(dummy, conf, iou, imgsz) for _ in range(batcher.max_batch)]
+        for fut in futures:
+            fut.result()
+
+
+def warm_faiss(index_service, shape3d_services):
+    """
+    Index chargés (rechargés si besoin) + une recherche factice par index
+    pour amener les pages en mémoire
+    """
+    for class_id in list(index_service.indices):
+        dim = index_service.indices[class_id].d
+        index_service.search(class_id, np.ones(dim, dtype=np.float32), top_k=1)
+
+    for svc in shape3d_services.values():
+        svc.refresh()
+        if svc.index is not None and svc.index.ntotal > 0:
+            svc.search(np.zeros(svc.index.d, dtype=np.float32), top_k=1)
+
+
+def warm_features(describe_executor=None, size=256):
+    """
+    Banc de Gabor (noyaux + spectres à la taille de crop standard),
+    tables OpenCV, imports ; workers processus de /describe démarrés
+    """
+    rng = np.random.default_rng(0)
+    crop = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+    FeatureService().describe_object(crop)
+    if describe_executor is not None:
+        describe_executor.warmup()
@@ -0,0 +1,209 @@
+# services/yolo_batcher.py
+import time
+import queue
+import threading
+from collections import deque, Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class YoloBatcher:
+    """
+    Micro-batching devant YoloService :
+    - les requêtes /detect sont mises en file (profondeur bornée :
+      submit lève queue.Full si la file est pleine)
+    - un thread unique collecte jusqu'à max_batch images ou max_wait_ms
+      après l'arrivée de la première, puis lance UNE inférence batchée
+    - chaque résultat est renvoyé à son appelant (Future)
+    Seules des requêtes de mêmes paramètres (conf, iou, imgsz) partagent
+    un batch. Le thread unique sérialise aussi l'accès au modèle.
+    predict attend au plus `timeout` secondes (None : sans limite) ;
+    une requête expirée encore en file est abandonnée.
+    """
+
+    def __init__(self, yolo_service, max_batch=8, max_wait_ms=10.0, max_queue=64, window=1000,
+                 timeout=None):
+        self.yolo = yolo_service
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        # profondeur bornée dans submit : file + requêtes mises de côté
+        self._queue = queue.Queue()
+        self._pending = deque()     # requêtes mises de côté (autres paramètres)
+        self._lock = threading.Lock()
+
+        # métriques (fenêtre glissante des derniers batches / requêtes)
+        self._sizes = Counter()
+        self._batch_ms = deque(maxlen=window)
+        self._wait_ms = deque(maxlen=window)
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.batches = 0
+
+        threading.Thread(target=self._worker, name="yolo-batcher", daemon=True).start()
+
+    def submit(self, source, conf, iou, imgsz):
+        """
+        Args:
+            source: chemin d'image ou image BGR (ndarray)
+
+        Returns:
+            Future -> ultralytics Results de cette image
+        """
+        fut = Future()
+        with self._lock:
+            if self._depth_locked() >= self.max_queue:
+                self.rejected += 1
+                raise queue.Full
+            self._queue.put_nowait((source, (conf, iou, imgsz), fut, time.perf_counter()))
+            self.submitted += 1
+        return fut
+
+    def predict(self, source, conf, iou, imgsz, timeout=None):
+        """
+        Lève concurrent.futures.TimeoutError au-delà de timeout
+        (défaut : self.timeout)
+        """
+        fut = self.submit(source, conf, iou, imgsz)
+        try:
+            return fut.result(timeout=timeout if timeout is not None else self.timeout)
+        except FutureTimeout:
+            # encore en file : le worker l'ignorera
+            fut.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    def depth(self):
+        with self._lock:
+            return self._depth_locked()
+
+    def _depth_locked(self):
+        return self._queue.qsize() + len(self._pending)
+
+    # --------------------------------------------------
+    def _next(self):
+        with self._lock:
+            if self._pending:
+                return self._pending.popleft()
+        return self._queue.get()
+
+    def _collect(self):
+        first = self._next()
+        key = first[1]
+        batch = [first]
+        deadline = first[3] + self.max_wait_ms / 1000.0
+
+        # requêtes mises de côté au tour précédent avec les mêmes paramètres
+        with self._lock:
+            for item in list(self._pending):
+                if len(batch) >= self.max_batch:
+                    break
+                if item[1] == key:
+                    self._pending.remove(item)
+                    batch.append(item)
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[1] == key:
+                batch.append(item)
+            else:
+                with self._lock:
+                    self._pending.append(item)
+        return key, batch
+
+    def _predict(self, sources, key):
+        results = self.yolo.predict_batch(sources, *key)
+        if len(results) != len(sources):
+            raise RuntimeError(f"predict_batch returned {len(results)} results for {len(sources)} images")
+        return results
+
+    def _worker(self):
+        # le thread ne doit jamais mourir : toute erreur imprévue fait
+        # échouer les Futures du batch en cours, pas les suivants
+        while True:
+            batch = []
+            try:
+                key, batch = self._collect()
+                # requêtes expirées (annulées par predict) : ignorées
+                batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+                if batch:
+                    self._run(key, batch)
+            except Exception as e:
+                for _, _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _run(self, key, batch):
+        started = time.perf_counter()
+        waits = [(started - item[3]) * 1000.0 for item in batch]
+
+        try:
+            results = self._predict([item[0] for item in batch], key)
+            outcomes = list(zip(batch, results, [None] * len(batch)))
+        except Exception:
+            # une image illisible ne doit pas faire échouer tout le batch :
+            # on retombe en image par image pour isoler l'erreur
+            outcomes = []
+            for item in batch:
+                try:
+                    outcomes.append((item, self._predict([item[0]], key)[0], None))
+                except Exception as e:
+                    outcomes.append((item, None, e))
+
+        elapsed = (time.perf_counter() - started) * 1000.0
+        n_failed = 0
+        for (_, _, fut, _), result, error in outcomes:
+            if error is None:
+                fut.set_result(result)
+            else:
+                fut.set_exception(error)
+                n_failed += 1
+
+        with self._lock:
+            self.batches += 1
+            self._sizes[len(batch)] += 1
+            self._batch_ms.append(elapsed)
+            self._wait_ms.extend(waits)
+            self.completed += len(batch) - n_failed
+            self.failed += n_failed
+
+    # --------------------------------------------------
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return {"p50": None, "p95": None}
+        p50, p95 = np.percentile(np.asarray(values), [50, 95])
+        return {"p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+
+    def metrics(self):
+        with self._lock:
+            n_items = sum(size * count for size, count in self._sizes.items())
+            n_batches = sum(self._sizes.values())
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait_ms,
+                "max_queue": self.max_queue,
+                "timeout_s": self.timeout,
+                "queue_depth": self._depth_locked(),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "batches": self.batches,
+                "mean_batch_size": round(n_items / n_batches, 3) if n_batches else 0.0,
+                "batch_size_hist": {str(k): v for k, v in sorted(self._sizes.items())},
+                "queue_wait_ms": self._percentiles(list(self._wait_ms)),
+                "batch_inference_ms": self._percentiles(list(self._batch_ms)),
+            }
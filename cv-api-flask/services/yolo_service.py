@@ -2,32 +2,100 @@
 
 from __future__ import annotations
 from ultralytics import YOLO
+import importlib.util
+import os
 import threading
 
+# backend -> module Python requis (None : fourni par ultralytics / torch)
+BACKENDS = {
+    "pytorch": None,
+    "torchscript": None,
+    "onnx": "onnxruntime",
+    "openvino": "openvino",
+}
+
+
+def backend_artifact(weights_path: str, backend: str) -> str:
+    """
+    Chemin de l'artefact exporté pour un backend (convention de nommage
+    de l'export ultralytics, cf. export_yolo.py) :
+    best.pt -> best.onnx | best.torchscript | best_openvino_model/
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend '{backend}' (expected one of {tuple(BACKENDS)})")
+    if backend == "pytorch":
+        return weights_path
+    stem = os.path.splitext(weights_path)[0]
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    return f"{stem}.{backend}"
+
+
 class YoloService:
     """
     Loads YOLO model once and serves predictions.
     Thread-safe lazy loading.
+
+    backend : pytorch (best.pt) | torchscript | onnx | openvino.
+    Tous passent par le predictor ultralytics : letterbox, NMS
+    (conf / iou) et mise à l'échelle des boîtes sont les mêmes, seul
+    le forward change.
     """
     _lock = threading.Lock()
 
-    def __init__(self, weights_path: str):
+    def __init__(self, weights_path: str, backend: str = "pytorch", artifact_path: str | None = None):
         self.weights_path = weights_path
+        self.backend = backend
+        self.model_path = artifact_path or backend_artifact(weights_path, backend)
         self.model = None
 
+    @property
+    def model_name(self) -> str:
+        return os.path.basename(os.path.normpath(self.model_path))
+
     def load(self) -> None:
         if self.model is None:
             with self._lock:
                 if self.model is None:
-                    self.model = YOLO(self.weights_path)
+                    self._check_backend()
+                    self.model = YOLO(self.model_path, task="detect")
 
-    def predict(self, image_path: str, conf: float, iou: float, imgsz: int):
+    def _check_backend(self) -> None:
+        # échec explicite plutôt qu'une installation pip à la volée par ultralytics
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"YOLO {self.backend} model not found: {self.model_path} "
+                f"(run: python export_yolo.py --backend {self.backend})"
+            )
+        module = BACKENDS[self.backend]
+        if module is not None and importlib.util.find_spec(module) is None:
+            raise RuntimeError(f"YOLO backend '{self.backend}' requires: pip install {module}")
+
+    def predict(self, source, conf: float, iou: float, imgsz: int):
+        """
+        source: image BGR (ndarray, décodée en mémoire) ou chemin
+        """
         self.load()
         results = self.model.predict(
-            source=image_path,
+            source=source,
             conf=conf,
             iou=iou,
             imgsz=imgsz,
             verbose=False
         )
         return results
+
+    def predict_batch(self, sources: list, conf: float, iou: float, imgsz: int):
+        """
+        Une seule inférence pour plusieurs images (chemins ou ndarrays BGR).
+        Returns: liste de Results, dans l'ordre de sources
+        """
+        self.load()
+        return self.model.predict(
+            source=list(sources),
+            conf=conf,
+            iou=iou,
+            imgsz=imgsz,
+            batch=len(sources),
+            verbose=False
+        )
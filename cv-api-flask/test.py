@@ -1,7 +1,10 @@
 # test_index_3d.py
 
 import os
-from services.shape3d_index_service import Shape3DIndexService
+import argparse
+from config import Config
+from services.shape3d_index_service import Shape3DIndexService, shape3d_params, engine_index_dir
+from services.shape3d_descriptors import ENGINES
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -14,9 +17,38 @@ MODELS_DIR = os.path.join(
 
 LABELS_CSV = os.path.join(BASE_DIR, "labels.csv")
 
-svc = Shape3DIndexService()
+# même racine que app.py : le CLI et le serveur écrivent le même index
+SHAPE3D_ROOT = os.path.join(BASE_DIR, "data", "faiss", "shape3d")
 
-svc.build_index(
-    models_dir=MODELS_DIR,
-    labels_csv=LABELS_CSV
-)
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexation FAISS 3D (bulk)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processus d'extraction (défaut: nb CPU)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignore le cache de descripteurs et recalcule tout")
+    parser.add_argument("--engine", default="all", choices=("all",) + ENGINES,
+                        help="moteur de descripteurs à indexer (défaut: SHAPE3D_ENGINES)")
+    args = parser.parse_args()
+
+    engines = Config.SHAPE3D_ENGINES if args.engine == "all" else [args.engine]
+
+    for engine in engines:
+        print(f"[INFO] Moteur : {engine}")
+        svc = Shape3DIndexService(
+            index_dir=engine_index_dir(SHAPE3D_ROOT, engine),
+            params={**shape3d_params(Config), "engine": engine},
+            local_dtype=Config.SHAPE3D_LOCAL_DTYPE
+        )
+
+        svc.build_index(
+            models_dir=MODELS_DIR,
+            labels_csv=LABELS_CSV,
+            workers=args.workers,
+            use_cache=not args.no_cache
+        )
+
+
+# garde obligatoire : le pool d'extraction (spawn) ré-importe ce module
+if __name__ == "__main__":
+    main()
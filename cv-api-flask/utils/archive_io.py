@@ -0,0 +1,111 @@
+import io
+import os
+import csv
+import tarfile
+import zipfile
+
+
+# garde-fous contre les archives piégées (tailles décompressées) ;
+# même plafond par fichier que gunzip (services.shape3d_loader)
+MAX_MEMBER_SIZE = 512 * 1024 * 1024
+MAX_TOTAL_SIZE = 2 * 1024 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+def _members(fileobj, filename: str, wanted=None):
+    """
+    Itère (nom, taille déclarée, flux) des fichiers d'une archive
+    zip / tar(.gz, .bz2, .xz) ; wanted(nom) filtre avant toute lecture
+    """
+    name = filename.lower()
+    try:
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or (wanted and not wanted(info.filename)):
+                        continue
+                    with zf.open(info) as f:
+                        yield info.filename, info.file_size, f
+            return
+
+        if name.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")):
+            with tarfile.open(fileobj=fileobj, mode="r:*") as tf:
+                for m in tf:
+                    if not m.isfile() or (wanted and not wanted(m.name)):
+                        continue
+                    yield m.name, m.size, tf.extractfile(m)
+            return
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise ValueError(f"Archive illisible : {e}")
+
+    raise ValueError("Archive non supportée (zip, tar, tar.gz)")
+
+
+def _copy_bounded(src, dst, limit: int, name: str) -> int:
+    """
+    Copie par blocs de CHUNK_SIZE ; ValueError au-delà de limit octets
+    (la taille déclarée dans l'archive n'est pas fiable)
+    """
+    n = 0
+    while True:
+        chunk = src.read(min(CHUNK_SIZE, limit - n + 1))
+        if not chunk:
+            return n
+        n += len(chunk)
+        if n > limit:
+            raise ValueError(f"Fichier décompressé trop volumineux : {name}")
+        dst.write(chunk)
+
+
+def _wanted(name: str) -> bool:
+    base = os.path.basename(name).lower()
+    return bool(base) and not base.startswith(".") and (
+        base == "labels.csv" or base.endswith(".obj")
+    )
+
+
+def extract_obj_archive(fileobj, filename: str, dest_dir: str,
+                        max_member: int = MAX_MEMBER_SIZE, max_total: int = MAX_TOTAL_SIZE):
+    """
+    Extrait les .obj d'une archive dans dest_dir (noms aplatis, sans
+    chemin relatif : pas de traversée de dossiers) + labels.csv éventuel.
+    Lève ValueError si un fichier dépasse max_member octets une fois
+    décompressé, ou l'ensemble max_total.
+
+    Returns:
+        (liste (path, filename), labels: dict filename -> label)
+    """
+    objs = []
+    labels = {}
+    total = 0
+    for i, (name, size, src) in enumerate(_members(fileobj, filename, _wanted)):
+        base = os.path.basename(name)
+        if size > max_member:
+            raise ValueError(f"Fichier décompressé trop volumineux : {base}")
+        if total + size > max_total:
+            raise ValueError("Archive décompressée trop volumineuse")
+
+        limit = min(max_member, max_total - total)
+        if base.lower() == "labels.csv":
+            buf = io.BytesIO()
+            total += _copy_bounded(src, buf, limit, base)
+            buf.seek(0)
+            labels.update(read_labels_csv(buf))
+        else:
+            path = os.path.join(dest_dir, f"{i}_{base}")
+            with open(path, "wb") as f:
+                total += _copy_bounded(src, f, limit, base)
+            objs.append((path, base))
+    return objs, labels
+
+
+def read_labels_csv(fileobj) -> dict:
+    """
+    CSV au format labels.csv : colonnes filename,label
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig")
+    return {
+        row["filename"].strip(): row["label"].strip()
+        for row in csv.DictReader(text)
+        if row.get("filename")
+    }
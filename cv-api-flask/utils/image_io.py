@@ -1,5 +1,7 @@
 import os
 import uuid
+import cv2
+import numpy as np
 from PIL import Image
 from werkzeug.datastructures import FileStorage
 
@@ -17,6 +19,29 @@ def save_upload(file: FileStorage, upload_dir: str) -> str:
     file.save(path)
     return path
 
+def decode_upload(file: FileStorage):
+    """
+    Décode l'upload en mémoire (BGR), sans passer par le disque.
+    Returns None si l'image est illisible.
+    """
+    data = np.frombuffer(file.read(), dtype=np.uint8)
+    if data.size == 0:
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+def ingest_upload(file: FileStorage, persist_dir: str | None = None):
+    """
+    Un seul décodage en mémoire de l'upload ; copie de l'original dans
+    persist_dir seulement si demandé (opt-in, hors chemin critique sinon).
+    Returns: (image BGR ou None si illisible, chemin sauvegardé ou None)
+    """
+    img = decode_upload(file)
+    path = None
+    if persist_dir and img is not None:
+        file.stream.seek(0)
+        path = save_upload(file, persist_dir)
+    return img, path
+
 def get_image_size(path: str) -> tuple[int, int]:
     with Image.open(path) as img:
         return img.size  # (width, height)